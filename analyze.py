@@ -0,0 +1,179 @@
+# Description: Command line batch analysis of XiangQi positions. Positions are read one per line from a file or
+#  stdin, analyzed on a pool of worker processes and written as one JSON object per line, in the order they were
+#  read. Lines are handed to the workers in chunks and only a fixed number of chunks are in flight at once, so
+#  memory stays the same however long the input is.
+#  A line is a FEN, "startpos", or either of them followed by "moves" and moves in coordinate notation, as in the
+#  UCCI position command. A game record from a games file (a result such as 1-0, then the moves) or a bare list of
+#  moves gives the position after the moves.
+#  Run with: python analyze.py [input] [-o output] [--workers N] [--tasks legal,status,bestmove] [--depth N]
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+from xiangqi import XiangqiGame, START_FEN
+from engine import Searcher
+from move import move_from, move_to, move_to_str, str_to_move
+
+TASKS = ("legal", "status", "bestmove")
+DEFAULT_TASKS = "legal,status"
+DEFAULT_DEPTH = 3  # Plies searched for the bestmove task
+CHUNK_LINES = 16  # Lines given to a worker at a time
+CHUNKS_PER_WORKER = 4  # Chunks waiting or being analyzed per worker before reading more input
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")  # First token of a game record line
+
+_searcher = None  # Searcher of a worker process, made on its first bestmove task
+
+
+def parse_position(line):
+    """
+    Returns a XiangqiGame set up at the position described by a line of input, or None if the line is not a valid
+    position or one of its moves is illegal.
+    """
+    tokens = line.split()
+    if "moves" in tokens:
+        moves = tokens[tokens.index("moves") + 1:]
+        tokens = tokens[:tokens.index("moves")]
+    elif tokens and (tokens[0] in RESULTS or str_to_move(tokens[0]) is not None):
+        moves = tokens[1:] if tokens[0] in RESULTS else tokens
+        tokens = []
+    else:
+        moves = []
+
+    if tokens and tokens[0] == "fen":
+        tokens = tokens[1:]
+    if not tokens or tokens == ["startpos"]:
+        fen = START_FEN
+    else:
+        fen = " ".join(tokens)
+
+    game = XiangqiGame()
+    if game.load_fen(fen) is False:
+        return None
+    for text in moves:
+        move = str_to_move(text)
+        if move is None or move_to(move) not in game.legal_destinations(move_from(move)):
+            return None
+        game.push_move(move)
+    return game
+
+
+def analyze_line(line, tasks, depth):
+    """
+    Analyzes the position on one line of input.
+    :param line: the line, see parse_position()
+    :param tasks: the tasks to run, from TASKS
+    :param depth: plies searched for the bestmove task
+    :return: dictionary of the results, or with an "error" entry if the line is not a valid position
+    """
+    global _searcher
+    result = {"input": line.strip()}
+    game = parse_position(line)
+    if game is None:
+        result["error"] = "invalid position"
+        return result
+    result["fen"] = game.get_fen()
+
+    legal_moves = game.legal_moves()
+    count = sum(len(destinations) for destinations in legal_moves.values())
+    if "legal" in tasks:
+        result["legal_moves"] = count
+    if "status" in tasks:
+        in_check = game.general_exposed_test(game.get_current_player(), game.get_opponent_player())
+        if count == 0:
+            result["status"] = "checkmate" if in_check else "stalemate"
+        else:
+            result["status"] = "check" if in_check else "normal"
+    if "bestmove" in tasks:
+        if _searcher is None:
+            _searcher = Searcher()
+        move, score = _searcher.search(game, depth)
+        result["bestmove"] = move_to_str(move) if move is not None else None
+        result["score"] = score
+    return result
+
+
+def analyze_chunk(lines, tasks, depth):
+    """Analyzes a chunk of input lines and returns their results encoded as JSON lines."""
+    return [json.dumps(analyze_line(line, tasks, depth)) for line in lines]
+
+
+def read_chunks(source):
+    """Yields the non-empty lines of an input in lists of up to CHUNK_LINES lines."""
+    chunk = []
+    for line in source:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) == CHUNK_LINES:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_analysis(source, output, tasks, depth=DEFAULT_DEPTH, workers=None):
+    """
+    Analyzes every position of an input and writes the results in input order.
+    :param source: file or iterable of input lines
+    :param output: file the JSON lines are written to
+    :param tasks: the tasks to run, from TASKS
+    :param depth: plies searched for the bestmove task
+    :param workers: number of worker processes, or None for one per CPU. With 1 the work is done in this process.
+    :return: number of positions analyzed
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    count = 0
+    if workers == 1:
+        for chunk in read_chunks(source):
+            for line in analyze_chunk(chunk, tasks, depth):
+                output.write(line + "\n")
+            count += len(chunk)
+        return count
+
+    pending = collections.deque()  # Results of the chunks in flight, oldest first
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in read_chunks(source):
+            pending.append(pool.apply_async(analyze_chunk, (chunk, tasks, depth)))
+            count += len(chunk)
+            # Wait for the oldest chunk before reading more once enough are in flight
+            while len(pending) >= workers * CHUNKS_PER_WORKER:
+                for line in pending.popleft().get():
+                    output.write(line + "\n")
+        while pending:
+            for line in pending.popleft().get():
+                output.write(line + "\n")
+    return count
+
+
+def main(argv):
+    """Runs the analysis from the command line."""
+    parser = argparse.ArgumentParser(description="Analyzes XiangQi positions and writes JSON lines.")
+    parser.add_argument("input", nargs="?", default="-", help="file of positions, one per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="file to write the results to (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--tasks", default=DEFAULT_TASKS, help="comma separated tasks from: " + ", ".join(TASKS))
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="plies searched for bestmove")
+    args = parser.parse_args(argv)
+
+    tasks = tuple(task for task in args.tasks.split(",") if task)
+    for task in tasks:
+        if task not in TASKS:
+            parser.error("unknown task: " + task)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        run_analysis(source, output, tasks, args.depth, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
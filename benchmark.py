@@ -0,0 +1,260 @@
+# Description: Microbenchmarks of the rules engine and of drawing the game window. Each rules function is timed on
+#  a fixed set of positions (the opening, a middlegame, crowded cannon lines and endgames close to mate) and a frame
+#  of the window is drawn with pygame's dummy video driver, so no display is needed. Every timing is the best of a
+#  number of repeats, in microseconds per call. Results are written as JSON, and two result files can be compared to
+#  flag the benchmarks that got slower.
+#  Run with: python benchmark.py run [-o results.json] [--repeats N]
+#            python benchmark.py compare old.json new.json [--threshold 0.1]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from xiangqi import XiangqiGame, START_FEN
+from move import square_position, encode_move
+
+# Positions the rules functions are timed on. Red is to move in each.
+POSITIONS = {
+    "opening": START_FEN,
+    "middlegame": "r1bakab1r/9/1cn3n2/p1p1p3p/6p2/2P6/P3P1P1P/1CN1C1N2/9/R1BAKAB1R w - - 0 1",
+    "cannon_lines": "2bakab2/4c4/4n4/4p4/4c4/4C4/4P4/4N4/4C4/2BAKAB2 w - - 0 1",
+    "endgame_chariots": "4k4/R8/1R7/9/9/9/9/9/9/3K5 w - - 0 1",
+    "endgame_cannon": "4k4/9/4b4/1R7/5p3/9/3N5/5K3/1C7/9 w - - 0 1",
+}
+
+PIECE_NAMES = ("GENERAL", "ADVISOR", "ELEPHNT", "HORSE", "CHARIOT", "CANNON", "SOLDIER")
+
+REPEATS = 5  # Times each benchmark is run, the fastest run is kept
+MIN_TIME = 0.05  # Seconds a run should take at least, calls are added until it does
+RENDER_MOVES = 60  # Moves in the move list when timing the window
+THRESHOLD = 0.1  # Slowdown, as a fraction, reported as a regression by compare
+
+
+def time_call(func, repeats=REPEATS):
+    """
+    Times a function that takes no arguments.
+    :param func: the function
+    :param repeats: number of timed runs
+    :return: microseconds per call of the fastest run
+    """
+    # Find how many calls make a run long enough to time reliably
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for num in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        calls *= 2
+
+    best = elapsed
+    for num in range(repeats - 1):
+        start = time.perf_counter()
+        for num in range(calls):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def rules_benchmarks(name, fen, repeats=REPEATS):
+    """
+    Times the rules functions on a position.
+    :param name: name of the position, used as the start of each benchmark's name
+    :param fen: the position in FEN notation
+    :param repeats: number of timed runs of each benchmark
+    :return: dictionary of microseconds per call by benchmark name
+    :raises ValueError: if the FEN is not valid, rather than timing some other position
+    """
+    game = XiangqiGame()
+    if game.load_fen(fen) is False:
+        raise ValueError("Not a valid FEN for benchmark %s: %s" % (name, fen))
+    player = game.get_current_player()
+    enemy = game.get_opponent_player()
+    moves = [(square_position(from_sq), square_position(to_sq)) for from_sq, destinations in game.legal_moves().items()
+             for to_sq in destinations]
+    results = {}
+
+    # The legal moves of a position are cached, and every run after the first would find them there, so the cache
+    # is emptied before each call to time the work of a move played in a new position
+    def make_moves():
+        for curr_pos, new_pos in moves:
+            game._legal_cache.clear()
+            game.make_move(curr_pos, new_pos)
+            game.undo_move()
+
+    def legal_moves():
+        game._legal_cache.clear()
+        game.legal_moves()
+
+    # Timed per move, so positions with more moves are not slower for that alone
+    if moves:
+        results[name + "/make_move"] = time_call(make_moves, repeats) / len(moves)
+    results[name + "/legal_moves"] = time_call(legal_moves, repeats)
+    results[name + "/in_check_test"] = time_call(lambda: game.in_check_test(player, enemy), repeats)
+    results[name + "/end_game_test"] = time_call(lambda: game.end_game_test(player, enemy), repeats)
+    results[name + "/general_sight_test"] = time_call(game.general_sight_test, repeats)
+
+    # Each piece kind tests every square of the board, timed per test
+    grid = game.get_board()
+    for piece_name in PIECE_NAMES:
+        pieces = [piece for row in grid for piece in row if piece != "_______" and piece.get_name() == piece_name]
+        if not pieces:
+            continue
+
+        def test_squares():
+            for piece in pieces:
+                for row in range(10):
+                    for col in range(9):
+                        piece.legal_move_test([row, col])
+
+        results[name + "/legal_move_test/" + piece_name] = time_call(test_squares, repeats) / (len(pieces) * 90)
+    return results
+
+
+def render_benchmarks(repeats=REPEATS):
+    """
+    Times drawing the game window with pygame's dummy video driver, after a game of RENDER_MOVES moves so the move
+    list is full.
+    :param repeats: number of timed runs of each benchmark
+    :return: dictionary of microseconds per call by benchmark name
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from main import WINDOW_SIZE, draw_board, draw_move_list
+
+    pygame.init()
+    screen = pygame.display.set_mode(WINDOW_SIZE)
+    font = pygame.font.SysFont('Calibri', 18, False, False)
+
+    # Play the first legal move of each position, then select a piece so its destinations are marked
+    game = XiangqiGame()
+    for num in range(RENDER_MOVES):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        from_sq = min(moves)
+        game.push_move(encode_move(from_sq, min(moves[from_sq])))
+    grid = game.get_board()
+    history = game.get_history()
+    moves = game.legal_moves()
+    selected = min(moves) if moves else None
+    destinations = moves.get(selected, [])
+
+    def frame():
+        draw_board(screen, font, grid, selected, destinations)
+        draw_move_list(screen, font, history)
+        pygame.display.flip()
+
+    results = {
+        "render/draw_board": time_call(lambda: draw_board(screen, font, grid, selected, destinations), repeats),
+        "render/draw_move_list": time_call(lambda: draw_move_list(screen, font, history), repeats),
+        "render/flip": time_call(pygame.display.flip, repeats),
+        "render/frame": time_call(frame, repeats),
+    }
+    pygame.quit()
+    return results
+
+
+def run_benchmarks(repeats=REPEATS, render=True):
+    """
+    Runs every benchmark. The rules functions print debug messages, which are sent to the null device meanwhile.
+    :param repeats: number of timed runs of each benchmark
+    :param render: False to leave out the window benchmarks
+    :return: dictionary of the run's details under "meta" and microseconds per call by benchmark name under "results"
+    """
+    results = {}
+    stdout = sys.stdout
+    with open(os.devnull, "w") as null:
+        sys.stdout = null
+        try:
+            for name, fen in POSITIONS.items():
+                results.update(rules_benchmarks(name, fen, repeats))
+            if render:
+                results.update(render_benchmarks(repeats))
+        finally:
+            sys.stdout = stdout
+
+    meta = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "repeats": repeats}
+    return {"meta": meta, "results": results}
+
+
+def compare_results(old, new, threshold=THRESHOLD):
+    """
+    Compares the timings of two benchmark runs.
+    :param old: results of the earlier run, as returned by run_benchmarks()
+    :param new: results of the later run
+    :param threshold: slowdown, as a fraction of the old time, above which a benchmark is a regression
+    :return: list of (name, old microseconds, new microseconds, ratio, flag) for the benchmarks in both runs, where
+        flag is "REGRESSION", "faster" or ""
+    """
+    rows = []
+    for name, new_time in new["results"].items():
+        old_time = old["results"].get(name)
+        if old_time is None or old_time <= 0:
+            continue
+        ratio = new_time / old_time
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            flag = "faster"
+        else:
+            flag = ""
+        rows.append((name, old_time, new_time, ratio, flag))
+    return rows
+
+
+def load_results(path):
+    """Returns the benchmark results in a JSON file, or None if it cannot be read."""
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("results"), dict):
+        return None
+    return data
+
+
+def main(argv):
+    """Runs or compares benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the XiangQi rules engine and window.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("-o", "--output", default=None, help="JSON file to write the results to")
+    run.add_argument("--repeats", type=int, default=REPEATS, help="timed runs of each benchmark")
+    run.add_argument("--no-render", action="store_true", help="leave out the window benchmarks")
+    compare = commands.add_parser("compare", help="flag the benchmarks that got slower between two runs")
+    compare.add_argument("old", help="JSON results of the earlier run")
+    compare.add_argument("new", help="JSON results of the later run")
+    compare.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown flagged, e.g. 0.1 for 10%%")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        data = run_benchmarks(args.repeats, not args.no_render)
+        for name, micros in data["results"].items():
+            print("%-40s %12.2f us" % (name, micros))
+        if args.output is not None:
+            with open(args.output, "w") as file:
+                json.dump(data, file, indent=2)
+        return 0
+
+    old = load_results(args.old)
+    new = load_results(args.new)
+    for path, data in ((args.old, old), (args.new, new)):
+        if data is None:
+            print("Not a benchmark results file:", path)
+            return 2
+    rows = compare_results(old, new, args.threshold)
+    for name, old_time, new_time, ratio, flag in rows:
+        print("%-40s %12.2f %12.2f %7.2fx  %s" % (name, old_time, new_time, ratio, flag))
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    print("%d benchmarks compared, %d regressions" % (len(rows), len(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,345 @@
+# Description: Computer opponent for the XiangQi game. Searcher picks a move with an iterative deepening alpha-beta
+#  search over XiangqiGame.legal_moves(). EngineDriver runs a Searcher on a background thread and passes requests
+#  and results through queues, so the pygame loop keeps handling events and drawing while the computer thinks.
+
+import queue
+import threading
+import time
+import traceback
+from xiangqi import XiangqiGame
+from evaluation import Evaluator, PIECE_VALUES
+from exchange import exchange_on_squares
+from move import PIECE_KINDS, MOVE_MASK, encode_move
+
+MATE_SCORE = 100000  # Score of being checkmated (or stalemated, which also loses), less the plies to get there
+DEFAULT_DEPTH = 3  # Plies searched when no other depth is given
+DEFAULT_MOVETIME = 3.0  # Seconds the computer may think about a move
+PONDER_REPLIES = 3  # Number of the opponent's likely replies whose answers are searched while the opponent thinks
+STOP_CHECK_NODES = 256  # Nodes searched between checks of the clock and the stop event
+BEST_MOVE_TABLE_SIZE = 100000  # Positions whose best move is remembered for move ordering
+
+
+class SearchStopped(Exception):
+    """Raised inside a search when it runs out of time or is stopped."""
+    pass
+
+
+class Searcher:
+    """Iterative deepening alpha-beta search for the best move of the player to move."""
+
+    def __init__(self, stop_event=None, make_evaluator=Evaluator):
+        """
+        Creates a searcher.
+        :param stop_event: threading.Event that stops any search in progress when set
+        :param make_evaluator: function returning the evaluator of a game, such as evaluation.Evaluator or
+            lambda game: nnue.NnueEvaluator(game, network)
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        self._stop_event = stop_event
+        self._deadline = None
+        self._max_nodes = None
+        self._stopped = False
+        self._nodes = 0
+        self._best_moves = {}  # Best move found at each position key, searched first next time
+        self._make_evaluator = make_evaluator
+        self._evaluator = None  # Evaluator following the game being searched
+
+    def get_nodes(self):
+        """Returns the number of positions visited by the last search."""
+        return self._nodes
+
+    def was_stopped(self):
+        """Returns True if the last search ended early because of the time limit or the stop event."""
+        return self._stopped
+
+    def stop(self):
+        """Stops the search in progress."""
+        self._stop_event.set()
+
+    def search(self, game, depth=DEFAULT_DEPTH, movetime=None, info=None, nodes=None):
+        """
+        Searches the current position of a game one ply deeper at a time, until the depth or time limit is reached or
+        the search is stopped. The game is left in the position it started in.
+        :param game: the XiangqiGame to search
+        :param depth: the deepest search in plies
+        :param movetime: seconds to search for, or None for no time limit
+        :param info: optional function called after each completed depth with the depth, score, nodes and
+            principal variation
+        :param nodes: number of positions to search, or None for no limit
+        :return: tuple of the best move found (None if there are no legal moves) and its score
+        """
+        self._nodes = 0
+        self._stopped = False
+        self._deadline = None if movetime is None else time.time() + movetime
+        self._max_nodes = nodes
+        if len(self._best_moves) > BEST_MOVE_TABLE_SIZE:
+            self._best_moves.clear()
+
+        moves = self.ordered_moves(game)
+        if not moves:
+            return None, -MATE_SCORE
+
+        self._evaluator = self._make_evaluator(game)
+        best_move = moves[0]
+        best_score = self._evaluator.evaluate()
+        try:
+            for current_depth in range(1, depth + 1):
+                try:
+                    best_score = self._negamax(game, current_depth, -MATE_SCORE - 1, MATE_SCORE + 1, 0)
+                except SearchStopped:
+                    self._stopped = True
+                    break
+                best_move = self._best_moves[game.get_position_key()]
+                if info is not None:
+                    info(current_depth, best_score, self._nodes, self.principal_variation(game, current_depth))
+                if abs(best_score) >= MATE_SCORE - current_depth:  # A forced mate was found, no need to go deeper
+                    break
+        finally:
+            game.remove_listener(self._evaluator)
+            self._evaluator = None
+
+        return best_move, best_score
+
+    def principal_variation(self, game, depth):
+        """Returns the line of best moves found from the current position, up to depth moves long."""
+        pv = []
+        for num in range(depth):
+            move = self._best_moves.get(game.get_position_key())
+            if move is None or move not in self.ordered_moves(game):
+                break
+            pv.append(move)
+            game.push_move(move)
+        for move in pv:
+            game.undo_move()
+        return pv
+
+    def ordered_moves(self, game):
+        """
+        Returns the legal moves of the player to move as packed moves, in the order to search them: the best move
+        found earlier first, then captures that do not lose material in the exchange (most valuable pieces taken by
+        the least valuable ones first), then the captures that lose material, then the rest.
+        """
+        board = game.get_board()
+        squares = None  # Board as piece codes for the static exchange evaluation, made on the first capture
+        captures = []
+        losing = []
+        quiet = []
+        for from_sq, destinations in game.legal_moves().items():
+            mover = PIECE_VALUES[PIECE_KINDS[board[from_sq // 9][from_sq % 9].get_name()]]
+            for to_sq in destinations:
+                target = board[to_sq // 9][to_sq % 9]
+                if target != "_______":
+                    kind = PIECE_KINDS[target.get_name()]
+                    move = encode_move(from_sq, to_sq, kind)
+                    if squares is None:
+                        squares = self._evaluator.get_squares() if self._evaluator is not None else game.get_squares()
+                    exchange = exchange_on_squares(squares, to_sq, from_sq)
+                    if exchange >= 0:
+                        captures.append((PIECE_VALUES[kind] * 100 - mover, move))
+                    else:
+                        losing.append((exchange, move))
+                else:
+                    quiet.append(encode_move(from_sq, to_sq))
+        captures.sort(reverse=True)
+        losing.sort(reverse=True)
+        moves = [move for score, move in captures] + [move for score, move in losing] + quiet
+
+        best = self._best_moves.get(game.get_position_key())
+        if best is not None and best in moves:
+            moves.remove(best)
+            moves.insert(0, best)
+        return moves
+
+    def _check_stop(self):
+        """Raises SearchStopped if the stop event is set or the time or node limit is reached."""
+        if self._stop_event.is_set() or (self._deadline is not None and time.time() > self._deadline) or \
+                (self._max_nodes is not None and self._nodes >= self._max_nodes):
+            raise SearchStopped()
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """
+        Returns the score of the current position for the player to move, searched depth plies deep.
+        :param alpha: lowest score the player to move is already sure of
+        :param beta: highest score the opponent will allow
+        :param ply: plies from the root of the search, used to prefer quicker mates
+        """
+        self._nodes += 1
+        if self._nodes % STOP_CHECK_NODES == 0:
+            self._check_stop()
+
+        if depth == 0:
+            return self._evaluator.evaluate()
+
+        moves = self.ordered_moves(game)
+        if not moves:  # Checkmate or stalemate, both lose
+            return -MATE_SCORE + ply
+
+        best_score = -MATE_SCORE - 1
+        best_move = None
+        for move in moves:
+            game.push_move(move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        self._best_moves[game.get_position_key()] = best_move
+        return best_score
+
+
+class EngineDriver:
+    """
+    Runs a Searcher on a background thread so the caller never waits for a search. Positions are sent as the list
+    of moves played from the start of the game and the best move comes back through a queue, see poll().
+    While the opponent is thinking, the driver searches its answers to the opponent's most likely replies, so the
+    answer to the move actually played is often ready as soon as it is requested.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH, movetime=DEFAULT_MOVETIME):
+        """Creates the driver and starts its worker thread."""
+        self._depth = depth
+        self._movetime = movetime
+        self._commands = queue.Queue()
+        self._results = queue.Queue()
+        self._stop_event = threading.Event()
+        self._searcher = Searcher(self._stop_event)
+        self._lock = threading.Lock()  # Guards _searching, _wanted and the stop event against the worker
+        self._searching = None  # Moves leading to the position the worker is searching
+        self._wanted = None  # Moves leading to the position a move was last requested for
+        self._ponder_results = {}  # Answers found while pondering, by the moves leading to the position
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request_move(self, game):
+        """Asks for the best move in the current position of a game. The move is returned later by poll()."""
+        moves = self._game_moves(game)
+        with self._lock:
+            self._wanted = moves
+            self._commands.put(("move", moves))
+            if self._searching != moves:  # Keep searching if the position is already being pondered
+                self._stop_event.set()
+
+    def ponder(self, game):
+        """Starts searching the answers to the likely replies in a game while the opponent thinks."""
+        with self._lock:
+            self._commands.put(("ponder", self._game_moves(game)))
+
+    def poll(self):
+        """
+        Returns the move found for the last requested position, or None if it is not ready yet or the search ended
+        without finding one. is_waiting() tells the two apart.
+        """
+        while True:
+            try:
+                moves, move = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            if moves == self._wanted:
+                self._wanted = None
+                return move
+
+    def is_waiting(self):
+        """Returns True while a requested move has not been returned by poll() yet and the worker is still running."""
+        return self._wanted is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Abandons the search in progress and any requests still waiting."""
+        with self._lock:
+            self._wanted = None
+            while not self._commands.empty():
+                self._commands.get_nowait()
+            self._stop_event.set()
+
+    def close(self):
+        """Stops the worker thread."""
+        self.stop()
+        self._commands.put(("quit", None))
+        self._thread.join()
+
+    def _game_moves(self, game):
+        """Returns the moves played so far in a game as a tuple."""
+        history = game.get_history()
+        return tuple(move & MOVE_MASK for move in history.get_moves(0, history.get_ply()))
+
+    def _begin(self, moves):
+        """Marks the start of a search of a position. Returns False if newer commands are waiting instead."""
+        with self._lock:
+            if not self._commands.empty():
+                return False
+            self._searching = moves
+            self._stop_event.clear()
+            return True
+
+    def _search(self, moves):
+        """Searches the position after a list of moves. Returns the best move, or None if it was stopped."""
+        game = XiangqiGame()
+        for move in moves:
+            game.push_move(move)
+        move, score = self._searcher.search(game, self._depth, self._movetime)
+        with self._lock:
+            self._searching = None
+            if self._stop_event.is_set():
+                return None
+        return move
+
+    def _ponder(self, moves):
+        """Searches the answers to the opponent's most likely replies in the position after a list of moves."""
+        game = XiangqiGame()
+        for move in moves:
+            game.push_move(move)
+
+        # The opponent's likely replies are the ones that look best for them after one ply
+        evaluator = Evaluator(game)
+        replies = []
+        for reply in self._searcher.ordered_moves(game):
+            game.push_move(reply)
+            replies.append((-evaluator.evaluate(), reply))
+            game.undo_move()
+        replies.sort(reverse=True)
+        game.remove_listener(evaluator)
+
+        for score, reply in replies[:PONDER_REPLIES]:
+            position = moves + (reply & MOVE_MASK,)
+            if not self._begin(position):
+                return
+            move = self._search(position)
+            if move is None:
+                return
+            self._ponder_results[position] = move
+
+    def _run(self):
+        """Worker thread: carries out commands until told to quit."""
+        while True:
+            command, moves = self._commands.get()
+            if command == "quit":
+                return
+            elif command == "ponder":
+                self._ponder_results.clear()
+                try:
+                    self._ponder(moves)
+                except Exception:
+                    traceback.print_exc()
+                    with self._lock:
+                        self._searching = None
+            elif command == "move":
+                move = self._ponder_results.get(moves)
+                if move is None:
+                    if not self._begin(moves):
+                        continue  # A newer command is waiting and answers instead
+                    try:
+                        move = self._search(moves)
+                    except Exception:
+                        traceback.print_exc()
+                        with self._lock:
+                            self._searching = None
+                # A move of None tells poll() that the search ended without a move
+                self._results.put((moves, move))
@@ -0,0 +1,294 @@
+# Description: Static evaluation of XiangQi positions for the engine. An Evaluator follows a XiangqiGame as a
+#  listener and keeps running totals of material, piece-square and mobility scores for both colors, updating them
+#  from each move, capture and undo, so evaluating a position is a few additions instead of a scan of the board.
+
+from move import NO_PIECE, GENERAL, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER, RED, BLACK, piece_code, \
+    move_from, move_to, move_captured
+
+# Material value of each piece kind, indexed by kind. The General is never captured, so it is not counted.
+PIECE_VALUES = (0, 0, 200, 200, 400, 900, 450, 100)
+
+MOBILITY_WEIGHT = 5  # Score of each square a chariot, cannon or horse can move to
+MOBILE_KINDS = (HORSE, CHARIOT, CANNON)  # Pieces whose mobility is counted
+
+# Piece-square tables from red's side of the board: the first row is row 0, red's back rank. Black uses them
+# mirrored top to bottom. Values are added to the piece's material value.
+GENERAL_TABLE = (
+    (0, 0, 0, 15, 20, 15, 0, 0, 0),
+    (0, 0, 0, -10, -5, -10, 0, 0, 0),
+    (0, 0, 0, -30, -25, -30, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+ADVISOR_TABLE = (
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 5, 0, 0, 0, 0),
+    (0, 0, 0, -2, 0, -2, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+ELEPHANT_TABLE = (
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (-5, 0, 0, 0, 8, 0, 0, 0, -5),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, -2, 0, 0, 0, -2, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+HORSE_TABLE = (
+    (-20, -10, -5, -5, -10, -5, -5, -10, -20),
+    (-10, -5, 0, 0, -15, 0, 0, -5, -10),
+    (-5, 5, 10, 5, 10, 5, 10, 5, -5),
+    (0, 10, 15, 15, 10, 15, 15, 10, 0),
+    (0, 15, 20, 20, 20, 20, 20, 15, 0),
+    (5, 20, 25, 25, 25, 25, 25, 20, 5),
+    (5, 25, 30, 35, 30, 35, 30, 25, 5),
+    (10, 25, 35, 35, 40, 35, 35, 25, 10),
+    (10, 20, 30, 50, 25, 50, 30, 20, 10),
+    (0, 5, 15, 20, 5, 20, 15, 5, 0))
+
+CHARIOT_TABLE = (
+    (-10, 5, 0, 10, 0, 10, 0, 5, -10),
+    (0, 5, 5, 10, 5, 10, 5, 5, 0),
+    (0, 5, 5, 10, 10, 10, 5, 5, 0),
+    (0, 10, 5, 15, 15, 15, 5, 10, 0),
+    (5, 10, 10, 15, 15, 15, 10, 10, 5),
+    (5, 15, 15, 20, 20, 20, 15, 15, 5),
+    (5, 15, 15, 20, 20, 20, 15, 15, 5),
+    (10, 20, 20, 25, 25, 25, 20, 20, 10),
+    (20, 25, 25, 35, 35, 35, 25, 25, 20),
+    (10, 15, 15, 20, 15, 20, 15, 15, 10))
+
+CANNON_TABLE = (
+    (0, 0, 5, 10, 10, 10, 5, 0, 0),
+    (0, 5, 5, 5, 10, 5, 5, 5, 0),
+    (5, 5, 5, 10, 20, 10, 5, 5, 5),
+    (0, 0, 5, 5, 5, 5, 5, 0, 0),
+    (0, 5, 5, 5, 10, 5, 5, 5, 0),
+    (0, 5, 0, 5, 10, 5, 0, 5, 0),
+    (0, 5, 0, 5, 10, 5, 0, 5, 0),
+    (5, 5, 5, 5, 15, 5, 5, 5, 5),
+    (5, 5, 0, -5, -10, -5, 0, 5, 5),
+    (20, 15, 10, 0, -5, 0, 10, 15, 20))
+
+SOLDIER_TABLE = (
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, 0, 0, 0, 0, 0, 0, 0),
+    (0, 0, -2, 0, 6, 0, -2, 0, 0),
+    (2, 0, 8, 0, 10, 0, 8, 0, 2),
+    (60, 80, 90, 100, 110, 100, 90, 80, 60),
+    (80, 100, 120, 140, 150, 140, 120, 100, 80),
+    (90, 110, 130, 150, 160, 150, 130, 110, 90),
+    (80, 100, 120, 140, 150, 140, 120, 100, 80),
+    (20, 30, 40, 50, 60, 50, 40, 30, 20))
+
+PIECE_TABLES = {GENERAL: GENERAL_TABLE, ADVISOR: ADVISOR_TABLE, ELEPHANT: ELEPHANT_TABLE, HORSE: HORSE_TABLE,
+                CHARIOT: CHARIOT_TABLE, CANNON: CANNON_TABLE, SOLDIER: SOLDIER_TABLE}
+
+
+def build_square_values():
+    """
+    Returns the value of every piece on every square, material plus piece-square bonus, as a list indexed by piece
+    code (kind + 8 for black) of lists indexed by square.
+    """
+    values = [[0] * 90 for code in range(16)]
+    for kind, table in PIECE_TABLES.items():
+        for row in range(10):
+            for col in range(9):
+                values[kind][row * 9 + col] = PIECE_VALUES[kind] + table[row][col]
+                values[kind + 8][row * 9 + col] = PIECE_VALUES[kind] + table[9 - row][col]
+    return values
+
+
+SQUARE_VALUES = build_square_values()
+
+HORSE_STEPS = ((2, 1, 1, 0), (2, -1, 1, 0), (-2, 1, -1, 0), (-2, -1, -1, 0),
+               (1, 2, 0, 1), (-1, 2, 0, 1), (1, -2, 0, -1), (-1, -2, 0, -1))  # Row, column, leg row, leg column
+LINE_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class Evaluator:
+    """
+    Incremental evaluation of a XiangqiGame. Keeps its own copy of the board as piece codes (kind + 8 for black)
+    with running totals of each color's material plus piece-square values and mobility.
+    """
+
+    def __init__(self, game):
+        """Creates an evaluator for the current position of a game and starts following its moves."""
+        self._squares = [0] * 90
+        self._values = [0, 0]  # Material plus piece-square value of red and black
+        self._mobility = {}  # Color and mobility of the horse, chariot or cannon on each square
+        self._mobility_totals = [0, 0]
+        self._side = RED  # Color to move
+        self.position_set(game)
+        game.add_listener(self)
+
+    def evaluate(self):
+        """Returns the score of the position from the point of view of the color to move."""
+        side = self._side
+        return self._values[side] - self._values[1 - side] + \
+            MOBILITY_WEIGHT * (self._mobility_totals[side] - self._mobility_totals[1 - side])
+
+    def get_squares(self):
+        """Returns the evaluator's copy of the board as piece codes indexed by square. Do not change it."""
+        return self._squares
+
+    def get_values(self):
+        """Returns the material plus piece-square totals of red and black."""
+        return self._values
+
+    def position_set(self, game):
+        """Sets up the totals from scratch for the current position of a game."""
+        board = game.get_board()
+        self._values = [0, 0]
+        for row in range(10):
+            for col in range(9):
+                piece = board[row][col]
+                code = NO_PIECE
+                if piece != "_______":
+                    code = piece_code(piece)
+                    self._values[code >> 3] += SQUARE_VALUES[code][row * 9 + col]
+                self._squares[row * 9 + col] = code
+
+        self._mobility = {}
+        self._mobility_totals = [0, 0]
+        for sq in range(90):
+            if self._squares[sq] & 7 in MOBILE_KINDS:
+                self._add_mobility(sq)
+
+        self._side = RED if game.get_current_player().get_player_color() == "red" else BLACK
+
+    def move_made(self, move):
+        """Updates the totals after a move."""
+        squares = self._squares
+        from_sq = move_from(move)
+        to_sq = move_to(move)
+        code = squares[from_sq]
+        captured = squares[to_sq]
+        values = SQUARE_VALUES[code]
+
+        self._values[code >> 3] += values[to_sq] - values[from_sq]
+        if captured != NO_PIECE:
+            self._values[captured >> 3] -= SQUARE_VALUES[captured][to_sq]
+        squares[from_sq] = NO_PIECE
+        squares[to_sq] = code
+
+        self._update_mobility(from_sq, to_sq)
+        self._side = 1 - self._side
+
+    def move_undone(self, move):
+        """Restores the totals after a move is taken back."""
+        squares = self._squares
+        from_sq = move_from(move)
+        to_sq = move_to(move)
+        code = squares[to_sq]
+        values = SQUARE_VALUES[code]
+
+        self._values[code >> 3] += values[from_sq] - values[to_sq]
+        captured = NO_PIECE
+        if move_captured(move) != NO_PIECE:
+            captured = move_captured(move) + (8 if code < 8 else 0)  # The captured piece was the other color
+            self._values[captured >> 3] += SQUARE_VALUES[captured][to_sq]
+        squares[from_sq] = code
+        squares[to_sq] = captured
+
+        self._update_mobility(from_sq, to_sq)
+        self._side = 1 - self._side
+
+    def _update_mobility(self, sq1, sq2):
+        """
+        Updates the mobility totals after the pieces on two squares changed. Only the pieces on those squares and
+        the horses, chariots and cannons whose moves can pass through them are counted again.
+        """
+        for sq in (sq1, sq2):
+            if sq in self._mobility:
+                self._remove_mobility(sq)
+
+        rows = (sq1 // 9, sq2 // 9)
+        cols = (sq1 % 9, sq2 % 9)
+        for sq in list(self._mobility):
+            row = sq // 9
+            col = sq % 9
+            if self._squares[sq] & 7 == HORSE:
+                affected = (abs(row - rows[0]) <= 2 and abs(col - cols[0]) <= 2) or \
+                           (abs(row - rows[1]) <= 2 and abs(col - cols[1]) <= 2)
+            else:
+                affected = row in rows or col in cols
+            if affected:
+                self._remove_mobility(sq)
+                self._add_mobility(sq)
+
+        for sq in (sq1, sq2):
+            if self._squares[sq] & 7 in MOBILE_KINDS:
+                self._add_mobility(sq)
+
+    def _add_mobility(self, sq):
+        """Counts the moves of the horse, chariot or cannon on a square and adds them to its color's total."""
+        color = self._squares[sq] >> 3
+        count = self._count_moves(sq)
+        self._mobility[sq] = (color, count)
+        self._mobility_totals[color] += count
+
+    def _remove_mobility(self, sq):
+        """Takes the counted moves of the piece on a square out of its color's total."""
+        color, count = self._mobility.pop(sq)  # The piece on the square may already have changed
+        self._mobility_totals[color] -= count
+
+    def _count_moves(self, sq):
+        """Returns the number of squares the horse, chariot or cannon on a square can move to or capture on."""
+        squares = self._squares
+        code = squares[sq]
+        kind = code & 7
+        color = code >> 3
+        row = sq // 9
+        col = sq % 9
+        count = 0
+
+        if kind == HORSE:
+            for step in HORSE_STEPS:
+                new_row = row + step[0]
+                new_col = col + step[1]
+                if 0 <= new_row <= 9 and 0 <= new_col <= 8 and \
+                        squares[(row + step[2]) * 9 + col + step[3]] == NO_PIECE:
+                    target = squares[new_row * 9 + new_col]
+                    if target == NO_PIECE or target >> 3 != color:
+                        count += 1
+            return count
+
+        for step in LINE_STEPS:
+            new_row = row + step[0]
+            new_col = col + step[1]
+            screened = False
+            while 0 <= new_row <= 9 and 0 <= new_col <= 8:
+                target = squares[new_row * 9 + new_col]
+                if not screened:
+                    if target == NO_PIECE:
+                        count += 1
+                    elif kind == CHARIOT:
+                        if target >> 3 != color:
+                            count += 1
+                        break
+                    else:
+                        screened = True  # A cannon jumps the first piece to capture
+                elif target != NO_PIECE:
+                    if target >> 3 != color:
+                        count += 1
+                    break
+                new_row += step[0]
+                new_col += step[1]
+        return count
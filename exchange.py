@@ -0,0 +1,169 @@
+# Description: Static exchange evaluation (SEE) for the XiangQi game. Works out what a sequence of captures on one
+#  square wins or loses, each side capturing with its least valuable piece, on a scratch copy of the board so the
+#  game itself is never changed. The attackers are found again after every capture, so cannons gaining or losing
+#  their screen and horses whose leg is freed are taken into account.
+
+from evaluation import PIECE_VALUES, HORSE_STEPS, LINE_STEPS
+from move import NO_PIECE, GENERAL, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER
+
+GENERAL_VALUE = 10000  # Value of the General in an exchange, more than everything else together
+EXCHANGE_VALUES = (0, GENERAL_VALUE) + PIECE_VALUES[2:]  # Indexed by piece kind
+
+ADVISOR_STEPS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ELEPHANT_STEPS = ((2, 2, 1, 1), (2, -2, 1, -1), (-2, 2, -1, 1), (-2, -2, -1, -1))  # Row, column, eye row, eye column
+
+
+def in_palace(row, col, color):
+    """Returns True if a position is inside the palace of a color (0 red, 1 black)."""
+    if col < 3 or col > 5:
+        return False
+    if color == 0:
+        return 0 <= row <= 2
+    return 7 <= row <= 9
+
+
+def attackers(squares, sq, color):
+    """
+    Returns the squares of the pieces of a color (0 red, 1 black) that can capture on a square.
+    Pins and the rule against the Generals facing each other are ignored.
+    :param squares: the board as piece codes, see XiangqiGame.get_squares()
+    :param sq: the square being attacked
+    :param color: the attacking color
+    """
+    found = []
+    row = sq // 9
+    col = sq % 9
+    side = color << 3
+
+    # Chariots see the first piece along each line, cannons the piece after the first one
+    for step in LINE_STEPS:
+        new_row = row + step[0]
+        new_col = col + step[1]
+        screened = False
+        while 0 <= new_row <= 9 and 0 <= new_col <= 8:
+            code = squares[new_row * 9 + new_col]
+            if code != NO_PIECE:
+                if not screened:
+                    if code == CHARIOT + side:
+                        found.append(new_row * 9 + new_col)
+                    screened = True
+                else:
+                    if code == CANNON + side:
+                        found.append(new_row * 9 + new_col)
+                    break
+            new_row += step[0]
+            new_col += step[1]
+
+    # A horse attacks if the square next to it on the way here is empty
+    for step in HORSE_STEPS:
+        horse_row = row - step[0]
+        horse_col = col - step[1]
+        if 0 <= horse_row <= 9 and 0 <= horse_col <= 8 and squares[horse_row * 9 + horse_col] == HORSE + side and \
+                squares[(horse_row + step[2]) * 9 + horse_col + step[3]] == NO_PIECE:
+            found.append(horse_row * 9 + horse_col)
+
+    # Soldiers capture forward, and sideways once across the river
+    forward = -1 if color == 0 else 1
+    if 0 <= row + forward <= 9 and squares[(row + forward) * 9 + col] == SOLDIER + side:
+        found.append((row + forward) * 9 + col)
+    if (color == 0 and row >= 5) or (color == 1 and row <= 4):
+        for new_col in (col - 1, col + 1):
+            if 0 <= new_col <= 8 and squares[row * 9 + new_col] == SOLDIER + side:
+                found.append(row * 9 + new_col)
+
+    # Advisors and the General stay in their palace, elephants on their side of the river
+    if in_palace(row, col, color):
+        for step in ADVISOR_STEPS:
+            new_row = row + step[0]
+            new_col = col + step[1]
+            if in_palace(new_row, new_col, color) and squares[new_row * 9 + new_col] == ADVISOR + side:
+                found.append(new_row * 9 + new_col)
+        for step in LINE_STEPS:
+            new_row = row + step[0]
+            new_col = col + step[1]
+            if in_palace(new_row, new_col, color) and squares[new_row * 9 + new_col] == GENERAL + side:
+                found.append(new_row * 9 + new_col)
+    if (color == 0 and row <= 4) or (color == 1 and row >= 5):
+        for step in ELEPHANT_STEPS:
+            new_row = row + step[0]
+            new_col = col + step[1]
+            if 0 <= new_row <= 9 and 0 <= new_col <= 8 and squares[new_row * 9 + new_col] == ELEPHANT + side and \
+                    squares[(row + step[2]) * 9 + col + step[3]] == NO_PIECE:
+                found.append(new_row * 9 + new_col)
+
+    return found
+
+
+def least_valuable_attacker(squares, sq, color):
+    """
+    Returns the square of the least valuable piece of a color that can capture on a square, or None.
+    The General is only returned if the other color could not capture it back.
+    """
+    best = None
+    for attacker in attackers(squares, sq, color):
+        if best is None or EXCHANGE_VALUES[squares[attacker] & 7] < EXCHANGE_VALUES[squares[best] & 7]:
+            best = attacker
+
+    if best is not None and squares[best] & 7 == GENERAL:
+        # Try the capture to see whether the General would be taken back
+        code = squares[best]
+        target = squares[sq]
+        squares[best] = NO_PIECE
+        squares[sq] = code
+        defended = len(attackers(squares, sq, 1 - color)) > 0
+        squares[best] = code
+        squares[sq] = target
+        if defended:
+            return None
+    return best
+
+
+def exchange_on_squares(squares, sq, from_sq=None):
+    """
+    Returns the material won by capturing the piece on a square and going on capturing there, each side with its
+    least valuable piece and only while it gains. The first capture is always made, so the result can be negative.
+    :param squares: the board as piece codes, see XiangqiGame.get_squares(). It is not changed.
+    :param sq: the square of the piece to capture
+    :param from_sq: the square of the piece making the first capture, or None for the least valuable attacker
+    :return: material won by the capturing side, 0 if the square is empty or cannot be captured on
+    """
+    if squares[sq] == NO_PIECE:
+        return 0
+    squares = list(squares)
+    color = 1 - (squares[sq] >> 3)  # The capturing color
+
+    attacker = from_sq if from_sq is not None else least_valuable_attacker(squares, sq, color)
+    if attacker is None:
+        return 0
+
+    gains = [EXCHANGE_VALUES[squares[sq] & 7]]
+    while True:
+        value = EXCHANGE_VALUES[squares[attacker] & 7]
+        squares[sq] = squares[attacker]
+        squares[attacker] = NO_PIECE
+        color = 1 - color
+        attacker = least_valuable_attacker(squares, sq, color)
+        if attacker is None:
+            break
+        # Taking back the piece that just captured is worth at most this much to the other side, if nothing takes
+        # back in turn
+        gains.append(value - gains[-1])
+        if gains[-1] < -gains[-2]:  # Not capturing at all is better than the best the capture can do
+            break
+
+    # Each side stops capturing when going on would lose
+    for num in range(len(gains) - 1, 0, -1):
+        gains[num - 1] = -max(-gains[num - 1], gains[num])
+    return gains[0]
+
+
+def static_exchange(game, sq, from_sq=None):
+    """
+    Returns the material won by capturing the piece on a square of a game and going on capturing there, without
+    making any moves on the game's board. The capturing side is the opponent of the piece's owner.
+    :param game: the XiangqiGame
+    :param sq: the square of the piece to capture, row * 9 + column
+    :param from_sq: the square of the piece making the first capture, or None for the least valuable attacker
+    :return: material won by the capturing side, in evaluation.PIECE_VALUES units
+    """
+    return exchange_on_squares(game.get_squares(), sq, from_sq)
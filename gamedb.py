@@ -0,0 +1,303 @@
+# Description: Database of archived XiangQi games that can be searched by position. Games are stored as compact
+#  move lists, and every position of every game is listed in an index sorted by Zobrist hash, so the games that
+#  reached a position are found by binary search instead of by replaying the games. All files are .npy arrays opened
+#  as memory maps, so a query reads only the few pages it needs however large the database is.
+#  The database is built in one pass over the games. Index entries are spread over bucket files by the top bits of
+#  their hash, and each bucket is then sorted on its own, so building needs memory for one bucket at a time.
+#  Run with: python gamedb.py build <games.txt> <directory>
+#            python gamedb.py query <directory> [<move> ...]
+#  A games file has one game per line: the result (1-0, 0-1, 1/2-1/2 or *) then the moves, such as "1-0 h2e2 h9g7".
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from xiangqi import XiangqiGame
+from move import NO_PIECE, MOVE_MASK, move_from, move_to, move_to_str, str_to_move
+from zobrist import hash_squares, update_hash
+
+RED_WIN = 1
+DRAW = 0
+BLACK_WIN = -1
+UNKNOWN_RESULT = 2
+RESULTS = {"1-0": RED_WIN, "0-1": BLACK_WIN, "1/2-1/2": DRAW, "*": UNKNOWN_RESULT}
+
+GAME_DTYPE = np.dtype([("offset", np.uint64), ("length", np.uint32), ("result", np.int8)])
+ENTRY_DTYPE = np.dtype([("game", np.uint32), ("ply", np.uint32)])
+BUCKET_DTYPE = np.dtype([("hash", np.uint64), ("game", np.uint32), ("ply", np.uint32)])
+
+BUCKET_BITS = 8  # Top bits of the hash choosing the bucket file of an index entry
+CHUNK_ENTRIES = 1 << 20  # Index entries gathered in memory before they are written to the bucket files
+
+
+def game_hash(game):
+    """Returns the Zobrist hash of the current position of a XiangqiGame."""
+    return game.get_hash()
+
+
+def read_games(path):
+    """
+    Yields the games of a games file as tuples of a list of packed moves and a result. A game's moves stop at the
+    first one that cannot be read. Empty lines, lines starting with # and lines that do not start with a result are
+    skipped.
+    """
+    with open(path) as games_file:
+        for line in games_file:
+            tokens = line.split()
+            if not tokens or tokens[0] not in RESULTS:
+                continue
+            moves = []
+            for text in tokens[1:]:
+                move = str_to_move(text)
+                if move is None:
+                    break
+                moves.append(move)
+            yield moves, RESULTS[tokens[0]]
+
+
+class _Spool:
+    """A growing array kept in a raw file while it is built, then copied into an .npy file a chunk at a time."""
+
+    def __init__(self, path, dtype):
+        """Starts an empty array in a raw file."""
+        self._path = path
+        self._dtype = np.dtype(dtype)
+        self._count = 0
+        open(path, "wb").close()
+
+    def extend(self, items):
+        """Appends a list or array of items."""
+        if len(items):
+            with open(self._path, "ab") as raw_file:
+                np.asarray(items, dtype=self._dtype).tofile(raw_file)
+            self._count += len(items)
+
+    def save(self, path):
+        """Copies the array into an .npy file and removes the raw file."""
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=self._dtype, shape=(self._count,))
+        with open(self._path, "rb") as raw_file:
+            for start in range(0, self._count, CHUNK_ENTRIES):
+                size = min(CHUNK_ENTRIES, self._count - start)
+                array[start:start + size] = np.fromfile(raw_file, dtype=self._dtype, count=size)
+        array.flush()
+        del array
+        os.remove(self._path)
+
+
+def build_database(directory, games):
+    """
+    Builds a database from games, replacing any database already in the directory. Every game starts from the usual
+    opening position. The pieces are followed on a list of piece codes rather than a XiangqiGame, so moves are not
+    checked against the rules; a game is cut short at a move from an empty square or onto a piece of the same color.
+    :param directory: directory of the database, created if needed
+    :param games: iterable of tuples of a list of packed moves and a result (RED_WIN, DRAW, BLACK_WIN or
+        UNKNOWN_RESULT), such as read_games() returns
+    :return: tuple of the number of games and the number of positions indexed
+    """
+    os.makedirs(directory, exist_ok=True)
+    start_squares = XiangqiGame().get_squares()
+    start_key = hash_squares(start_squares, 0)
+
+    moves_spool = _Spool(os.path.join(directory, "moves.raw"), np.uint16)
+    games_spool = _Spool(os.path.join(directory, "games.raw"), GAME_DTYPE)
+    buckets = 1 << BUCKET_BITS
+    bucket_paths = [os.path.join(directory, "bucket_%03d.raw" % num) for num in range(buckets)]
+    for path in bucket_paths:
+        open(path, "wb").close()
+
+    chunk_moves = []
+    chunk_games = []
+    hashes = []
+    game_ids = []
+    plies = []
+
+    def flush():
+        """Writes the gathered moves and games to their spools and the index entries to their buckets."""
+        moves_spool.extend(chunk_moves)
+        games_spool.extend(chunk_games)
+        entries = np.zeros(len(hashes), dtype=BUCKET_DTYPE)
+        entries["hash"] = hashes
+        entries["game"] = game_ids
+        entries["ply"] = plies
+        bucket = (entries["hash"] >> np.uint64(64 - BUCKET_BITS)).astype(np.intp)
+        entries = entries[np.argsort(bucket, kind="stable")]
+        ends = np.cumsum(np.bincount(bucket, minlength=buckets))
+        for num in range(buckets):
+            start = ends[num - 1] if num else 0
+            if ends[num] > start:
+                with open(bucket_paths[num], "ab") as bucket_file:
+                    entries[start:ends[num]].tofile(bucket_file)
+        del chunk_moves[:], chunk_games[:], hashes[:], game_ids[:], plies[:]
+
+    game_id = 0
+    offset = 0
+    for moves, result in games:
+        squares = list(start_squares)
+        key = start_key
+        length = 0
+        for move in moves:
+            from_sq = move_from(move)
+            to_sq = move_to(move)
+            code = squares[from_sq]
+            captured = squares[to_sq]
+            if code == NO_PIECE or code >> 3 != length & 1 or (captured != NO_PIECE and captured >> 3 == code >> 3):
+                break
+            hashes.append(key)
+            game_ids.append(game_id)
+            plies.append(length)
+            chunk_moves.append(move & MOVE_MASK)  # Stored as 16 bits, without the captured piece
+            key = update_hash(key, move, code, captured)
+            squares[from_sq] = NO_PIECE
+            squares[to_sq] = code
+            length += 1
+        hashes.append(key)  # The final position of the game is indexed too
+        game_ids.append(game_id)
+        plies.append(length)
+        chunk_games.append((offset, length, result))
+        offset += length
+        game_id += 1
+        if len(hashes) >= CHUNK_ENTRIES:
+            flush()
+    flush()
+
+    moves_spool.save(os.path.join(directory, "moves.npy"))
+    games_spool.save(os.path.join(directory, "games.npy"))
+
+    # Sort each bucket by hash. The sort is stable, so equal hashes stay in order of game and ply
+    total = sum(os.path.getsize(path) for path in bucket_paths) // BUCKET_DTYPE.itemsize
+    index_hashes = np.lib.format.open_memmap(os.path.join(directory, "hashes.npy"), mode="w+", dtype=np.uint64,
+                                             shape=(total,))
+    index_entries = np.lib.format.open_memmap(os.path.join(directory, "entries.npy"), mode="w+", dtype=ENTRY_DTYPE,
+                                              shape=(total,))
+    start = 0
+    for path in bucket_paths:
+        entries = np.fromfile(path, dtype=BUCKET_DTYPE)
+        entries = entries[np.argsort(entries["hash"], kind="stable")]
+        index_hashes[start:start + len(entries)] = entries["hash"]
+        index_entries["game"][start:start + len(entries)] = entries["game"]
+        index_entries["ply"][start:start + len(entries)] = entries["ply"]
+        start += len(entries)
+        os.remove(path)
+    index_hashes.flush()
+    index_entries.flush()
+    return game_id, total
+
+
+class GameDatabase:
+    """A database written by build_database(), opened as read-only memory maps."""
+
+    def __init__(self, directory):
+        """Opens the database in a directory."""
+        self._games = np.load(os.path.join(directory, "games.npy"), mmap_mode="r")
+        self._moves = np.load(os.path.join(directory, "moves.npy"), mmap_mode="r")
+        self._hashes = np.load(os.path.join(directory, "hashes.npy"), mmap_mode="r")
+        self._entries = np.load(os.path.join(directory, "entries.npy"), mmap_mode="r")
+
+    def get_game_count(self):
+        """Returns the number of games."""
+        return len(self._games)
+
+    def get_game(self, game_id):
+        """Returns the moves of a game as a list of packed moves, and its result."""
+        game = self._games[game_id]
+        offset = int(game["offset"])
+        return [int(move) for move in self._moves[offset:offset + int(game["length"])]], int(game["result"])
+
+    def find(self, key):
+        """
+        Returns every time a position was reached, as an array of ENTRY_DTYPE of the game and the ply at which it
+        was reached (0 for the opening position), in order of game and ply.
+        :param key: hash of the position, see game_hash()
+        """
+        key = np.uint64(key)
+        first = np.searchsorted(self._hashes, key, "left")
+        last = np.searchsorted(self._hashes, key, "right")
+        return np.array(self._entries[first:last])
+
+    def results(self, key):
+        """Returns the numbers of red wins, draws and black wins among the games that reached a position."""
+        games = self.find(key)["game"]
+        if len(games):
+            games = games[np.concatenate(([True], games[1:] != games[:-1]))]  # Entries are in order of game
+        counts = np.bincount(self._games[games]["result"] - BLACK_WIN, minlength=3)
+        return int(counts[RED_WIN - BLACK_WIN]), int(counts[DRAW - BLACK_WIN]), int(counts[0])
+
+    def continuations(self, key):
+        """
+        Returns the moves played from a position with how often each was played and the results of those games,
+        most played first.
+        :param key: hash of the position, see game_hash()
+        :return: list of tuples of the packed move, times played, red wins, draws and black wins
+        """
+        entries = self.find(key)
+        if not len(entries):
+            return []
+        games = self._games[entries["game"]]
+        played = entries["ply"] < games["length"]  # Not the final position of the game
+        games = games[played]
+        moves = self._moves[games["offset"] + entries["ply"][played]]
+
+        # Count every move and result at once, binned by move * 4 + result
+        counts = np.bincount(moves.astype(np.intp) * 4 + (games["result"] - BLACK_WIN), minlength=(MOVE_MASK + 1) * 4)
+        counts = counts.reshape(MOVE_MASK + 1, 4)
+        found = np.nonzero(counts.sum(axis=1))[0]
+        stats = [(int(move), int(counts[move].sum()), int(counts[move][RED_WIN - BLACK_WIN]),
+                  int(counts[move][DRAW - BLACK_WIN]), int(counts[move][0])) for move in found]
+        stats.sort(key=lambda stat: -stat[1])
+        return stats
+
+
+def load_database(directory):
+    """Returns the GameDatabase in a directory, or None if the directory has no database."""
+    for name in ("games.npy", "moves.npy", "hashes.npy", "entries.npy"):
+        if not os.path.exists(os.path.join(directory, name)):
+            return None
+    return GameDatabase(directory)
+
+
+def main(argv):
+    """Builds or queries a database from the command line."""
+    parser = argparse.ArgumentParser(description="Position-indexed XiangQi game database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a database from a games file")
+    build.add_argument("games", help="games file, one game per line: result then moves")
+    build.add_argument("directory", help="database directory")
+    query = commands.add_parser("query", help="show the games that reached a position")
+    query.add_argument("directory", help="database directory")
+    query.add_argument("moves", nargs="*", help="moves from the opening position to the position to look up")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.time()
+        games, positions = build_database(args.directory, read_games(args.games))
+        print("%d games, %d positions indexed in %.1fs" % (games, positions, time.time() - start))
+        return 0
+
+    database = load_database(args.directory)
+    if database is None:
+        print("No database in", args.directory)
+        return 1
+    game = XiangqiGame()
+    for text in args.moves:
+        move = str_to_move(text)
+        if move is None or move_to(move) not in game.legal_destinations(move_from(move)):
+            print("Illegal move:", text)
+            return 1
+        game.push_move(move)
+
+    start = time.time()
+    key = game_hash(game)
+    reached = database.find(key)
+    results = database.results(key)
+    continuations = database.continuations(key)
+    elapsed = time.time() - start
+    print("%d times in %d games: %d red wins, %d draws, %d black wins (%.1f ms)" % (
+        len(reached), len(np.unique(reached["game"])), results[0], results[1], results[2], elapsed * 1000))
+    for move, count, red_wins, draws, black_wins in continuations:
+        print("%s %8d  %d / %d / %d" % (move_to_str(move), count, red_wins, draws, black_wins))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
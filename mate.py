@@ -0,0 +1,236 @@
+# Description: Mate-in-N solver for XiangQi puzzles. MateSolver proves or disproves that the side to move can force
+#  checkmate (or stalemate, which also loses) within N of its own moves, using depth-first proof-number search
+#  (df-pn). Proof and disproof numbers are kept in a table of bounded size, so long forcing lines are searched in a
+#  fixed amount of memory: when the table is full, the entries that took the least work to find are dropped and
+#  worked out again if they are needed.
+#  Run with: python mate.py "<fen>" <moves> [--checks-only]
+
+import argparse
+import sys
+from xiangqi import XiangqiGame
+from move import move_from, move_to, move_to_str
+from zobrist import update_hash
+
+INFINITY = 10 ** 9  # Proof or disproof number of a node that is proven or disproven
+TABLE_SIZE = 200000  # Default number of positions kept in the proof number table
+MOVE_CACHE_SIZE = 20000  # Positions whose move lists are kept
+
+
+class MateSolver:
+    """
+    Depth-first proof-number search for forced mates. The attacker is the side to move at the root. At attacker
+    nodes one move must lead to mate (OR nodes), at defender nodes every move must (AND nodes). Each node's numbers
+    are stored the phi/delta way: phi is the proof number for the side to move's goal and delta the disproof number.
+    """
+
+    def __init__(self, table_size=TABLE_SIZE, max_nodes=None, checks_only=False):
+        """
+        Creates a solver.
+        :param table_size: most positions kept in the proof number table
+        :param max_nodes: most nodes to search in one solve() before giving up, or None for no limit
+        :param checks_only: True to try only checking moves for the attacker, as in continuous-check puzzles.
+            Much faster, but mates that need a quiet move are not found.
+        """
+        self._table_size = table_size
+        self._max_nodes = max_nodes
+        self._checks_only = checks_only
+        self._table = {}  # [phi, delta, work] by (position hash, plies left)
+        self._move_cache = {}  # Moves to search by (position hash, attacker to move)
+        self._nodes = 0
+        self._table_peak = 0
+        self._collections = 0
+
+    def get_nodes(self):
+        """Returns the number of nodes searched by the last solve()."""
+        return self._nodes
+
+    def get_table_peak(self):
+        """Returns the most positions the table held during the last solve()."""
+        return self._table_peak
+
+    def get_collections(self):
+        """Returns how many times the table was full and had entries dropped during the last solve()."""
+        return self._collections
+
+    def solve(self, game, moves):
+        """
+        Proves or disproves that the side to move in a game can force mate within a number of its own moves. Mates
+        in 1 move, 2 moves and so on are tried in turn, so a mating line found is a shortest one. The game is left
+        in the position it started in.
+        :param game: the XiangqiGame
+        :param moves: the most moves the attacker may make, e.g. 3 for mate in 3
+        :return: tuple of True and the mating line as packed moves if a mate was proven, False and an empty list if
+            there is no mate in that many moves, or None and an empty list if the node limit was reached first
+        """
+        self._table = {}
+        self._move_cache = {}
+        self._nodes = 0
+        self._table_peak = 0
+        self._collections = 0
+
+        for num in range(1, moves + 1):
+            plies = 2 * num - 1
+            phi, delta = self._mid(game, plies, True, INFINITY, INFINITY)
+            if phi == 0:
+                return True, self._mating_line(game, plies)
+            if self._max_nodes is not None and self._nodes >= self._max_nodes and delta != 0:
+                return None, []
+        return False, []
+
+    def _moves(self, game, attacker):
+        """Returns the moves to search at a node: every legal move, or for checks_only attackers the checks."""
+        key = (game.get_hash(), attacker)
+        moves = self._move_cache.get(key)
+        if moves is not None:
+            return moves
+
+        moves = game.legal_move_list()
+        if attacker and self._checks_only:
+            checks = []
+            for move in moves:
+                game.push_move(move)
+                if game.general_exposed_test(game.get_current_player(), game.get_opponent_player()):
+                    checks.append(move)
+                game.undo_move()
+            moves = checks
+
+        if len(self._move_cache) >= MOVE_CACHE_SIZE:
+            self._move_cache.clear()
+        self._move_cache[key] = moves
+        return moves
+
+    def _child_hashes(self, game, moves):
+        """Returns the hashes of the positions after each of a list of moves, without making the moves."""
+        squares = game.get_position_key()
+        key = game.get_hash()
+        return [update_hash(key, move, squares[move_from(move)], squares[move_to(move)]) for move in moves]
+
+    def _store(self, game, plies, phi, delta, work):
+        """Stores the numbers of the current position, dropping the least searched half of a full table first."""
+        if len(self._table) >= self._table_size:
+            entries = sorted(self._table.items(), key=lambda item: item[1][2], reverse=True)
+            self._table = dict(entries[:self._table_size // 2])
+            self._collections += 1
+        self._table[(game.get_hash(), plies)] = [phi, delta, work]
+        self._table_peak = max(self._table_peak, len(self._table))
+
+    def _mid(self, game, plies, attacker, phi_limit, delta_limit):
+        """
+        Searches the current position until its phi reaches phi_limit or its delta reaches delta_limit.
+        :param plies: plies left for the attacker to give mate in
+        :param attacker: True if the attacker is to move
+        :return: tuple of the position's phi and delta
+        """
+        self._nodes += 1
+        start = self._nodes
+        moves = self._moves(game, attacker)
+        if not moves:
+            # The side to move cannot move and loses. An attacker with no checks left to give fails too
+            self._store(game, plies, INFINITY, 0, 1)
+            return INFINITY, 0
+        if plies == 0:  # The defender still has moves when the attacker has run out of moves to mate in
+            self._store(game, plies, 0, INFINITY, 1)
+            return 0, INFINITY
+
+        children = self._child_hashes(game, moves)
+        table = self._table
+        unknown = [1, 1, 0]
+        while True:
+            # phi is the least delta of the children, delta the sum of their phis
+            phi = INFINITY
+            delta = 0
+            best = None
+            best_phi = 0
+            second_delta = INFINITY
+            for move, child in zip(moves, children):
+                child_phi, child_delta, work = table.get((child, plies - 1), unknown)
+                delta = min(delta + child_phi, INFINITY)
+                if child_delta < phi:
+                    second_delta = phi
+                    phi = child_delta
+                    best = move
+                    best_phi = child_phi
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+
+            out_of_nodes = self._max_nodes is not None and self._nodes >= self._max_nodes
+            if phi >= phi_limit or delta >= delta_limit or out_of_nodes:
+                self._store(game, plies, phi, delta, self._nodes - start + 1)
+                return phi, delta
+
+            game.push_move(best)
+            self._mid(game, plies - 1, not attacker, delta_limit + best_phi - delta,
+                      min(phi_limit, second_delta + 1))
+            game.undo_move()
+            table = self._table  # A full table is replaced by a smaller one
+
+    def _mating_line(self, game, plies):
+        """
+        Returns a mating line from the proven current position: the attacker plays a proven move and the defender
+        the reply whose proof took the most work, so the line shows the longest resistance found.
+        """
+        line = []
+        attacker = True
+        while True:
+            chosen = self._line_move(game, plies, attacker)
+            if chosen is None and attacker and plies > 0:
+                # The proof below this node was dropped from a full table, so prove it again
+                self._mid(game, plies, True, INFINITY, INFINITY)
+                chosen = self._line_move(game, plies, attacker)
+            if chosen is None:
+                break
+            line.append(chosen)
+            game.push_move(chosen)
+            plies -= 1
+            attacker = not attacker
+        for move in line:
+            game.undo_move()
+        return line
+
+    def _line_move(self, game, plies, attacker):
+        """
+        Returns the move of a mating line from the current position: a proven move for the attacker, the reply
+        whose proof took the most work for the defender, or None if there is none.
+        """
+        chosen = None
+        most_work = -1
+        moves = self._moves(game, attacker)
+        for move, child in zip(moves, self._child_hashes(game, moves)):
+            child_phi, child_delta, work = self._table.get((child, plies - 1), [1, 1, 0])
+            if attacker and child_delta == 0:
+                return move
+            if not attacker and work > most_work:
+                chosen = move
+                most_work = work
+        return chosen
+
+
+def main(argv):
+    """Solves a position from the command line."""
+    parser = argparse.ArgumentParser(description="Proves or disproves mate in N for a XiangQi position.")
+    parser.add_argument("fen", help="the position in FEN notation")
+    parser.add_argument("moves", type=int, help="most moves the side to move may take to give mate")
+    parser.add_argument("--checks-only", action="store_true", help="only try checking moves for the attacker")
+    parser.add_argument("--table-size", type=int, default=TABLE_SIZE, help="positions kept in the table")
+    parser.add_argument("--max-nodes", type=int, default=None, help="most nodes to search")
+    args = parser.parse_args(argv)
+
+    game = XiangqiGame()
+    if game.load_fen(args.fen) is False:
+        print("Not a valid FEN:", args.fen)
+        return 1
+    solver = MateSolver(args.table_size, args.max_nodes, args.checks_only)
+    result, line = solver.solve(game, args.moves)
+    if result is True:
+        print("Mate in %d: %s" % ((len(line) + 1) // 2, " ".join(move_to_str(move) for move in line)))
+    elif result is False:
+        print("No mate in %d" % args.moves)
+    else:
+        print("Unknown, node limit reached")
+    print("%d nodes, table peak %d, %d collections" % (solver.get_nodes(), solver.get_table_peak(),
+                                                      solver.get_collections()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
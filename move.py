@@ -0,0 +1,144 @@
+# Description: Packed integer moves and the array-backed move history used by the XiangQi game.
+#  A square is stored as a single integer, row * 9 + column (0 to 89). A move packs its from-square into bits 0-6
+#  and its to-square into bits 7-13, so the move itself fits in 16 bits. Bits 16-18 hold the kind of piece the
+#  move captured (NO_PIECE if none), which the game fills in when the move is made so that it can be undone.
+
+from array import array
+
+# Piece kinds. 0 is reserved for an empty square / no capture.
+NO_PIECE = 0
+GENERAL = 1
+ADVISOR = 2
+ELEPHANT = 3
+HORSE = 4
+CHARIOT = 5
+CANNON = 6
+SOLDIER = 7
+
+# Maps the piece names used on the board to their piece kind
+PIECE_KINDS = {"GENERAL": GENERAL, "ADVISOR": ADVISOR, "ELEPHNT": ELEPHANT, "HORSE": HORSE,
+               "CHARIOT": CHARIOT, "CANNON": CANNON, "SOLDIER": SOLDIER}
+
+# Colors, as used in piece codes: a piece code is its kind plus 8 for black, so code >> 3 is its color
+RED = 0
+BLACK = 1
+
+MOVE_MASK = 0xFFFF  # Bits that identify the move itself, without the captured piece
+FILES = "abcdefghi"
+
+
+def piece_code(piece):
+    """Returns the piece code of a piece on the board: its kind, plus 8 for a black piece."""
+    return PIECE_KINDS[piece.get_name()] + (8 if piece.get_piece_color() == "black" else 0)
+
+
+def square(row, col):
+    """Returns the square number of a board row and column."""
+    return row * 9 + col
+
+
+def square_position(sq):
+    """Returns the [row, column] board position of a square number."""
+    return [sq // 9, sq % 9]
+
+
+# The (row, column) of each square, looked up instead of dividing when a move is made. They are tuples so the table
+# cannot be changed; pieces keep their positions as lists of their own.
+SQUARE_POSITIONS = tuple((sq // 9, sq % 9) for sq in range(90))
+
+
+def encode_move(from_sq, to_sq, captured=NO_PIECE):
+    """Packs a from-square, to-square and captured piece kind into a single integer move."""
+    return from_sq | (to_sq << 7) | (captured << 16)
+
+
+def move_from(move):
+    """Returns the square a move starts from."""
+    return move & 0x7F
+
+
+def move_to(move):
+    """Returns the square a move ends on."""
+    return (move >> 7) & 0x7F
+
+
+def move_captured(move):
+    """Returns the kind of piece captured by a move, or NO_PIECE."""
+    return (move >> 16) & 0x7
+
+
+def move_to_str(move):
+    """Returns a move in coordinate notation, e.g. 'b2e2'. Files a-i are columns 0-8 and ranks are rows 0-9."""
+    from_sq = move_from(move)
+    to_sq = move_to(move)
+    return FILES[from_sq % 9] + str(from_sq // 9) + FILES[to_sq % 9] + str(to_sq // 9)
+
+
+def str_to_move(text):
+    """Parses a move in coordinate notation, e.g. 'b2e2'. Returns None if the text is not a valid move."""
+    if len(text) != 4 or text[0] not in FILES or text[2] not in FILES or not text[1].isdigit() \
+            or not text[3].isdigit():
+        return None
+    from_sq = square(int(text[1]), FILES.index(text[0]))
+    to_sq = square(int(text[3]), FILES.index(text[2]))
+    return encode_move(from_sq, to_sq)
+
+
+class MoveHistory:
+    """
+    Array-backed record of the moves made in a game, with a cursor for undo and redo.
+    Moves before the cursor have been played on the board. Moves after it have been undone and can be redone.
+    The from and to squares of each move are kept as 16-bit values and the captured piece kinds in a separate byte
+    array, so a stored move takes 3 bytes.
+    """
+
+    def __init__(self):
+        """Creates an empty move history."""
+        self._moves = array("H")  # From and to squares of each move, the move without its captured piece
+        self._captures = array("B")  # Kind of piece captured by each move, NO_PIECE if none
+        self._ply = 0
+
+    def __len__(self):
+        """Returns the number of moves stored, including undone moves."""
+        return len(self._moves)
+
+    def get_ply(self):
+        """Returns the number of moves currently played on the board."""
+        return self._ply
+
+    def get_moves(self, start=0, stop=None):
+        """
+        Returns a list of the stored packed moves, captured pieces included.
+        :param start: index of the first move returned
+        :param stop: index after the last move returned, or None for the end of the history
+        """
+        if stop is None:
+            stop = len(self._moves)
+        return [move | (captured << 16) for move, captured in zip(self._moves[start:stop], self._captures[start:stop])]
+
+    def record(self, move):
+        """
+        Records a move that was just played at the cursor.
+        Replaying the next undone move keeps the rest of the undone line, any other move discards it.
+        """
+        if self._ply < len(self._moves) and self._moves[self._ply] == move & MOVE_MASK:
+            self._captures[self._ply] = move_captured(move)
+        else:
+            del self._moves[self._ply:]
+            del self._captures[self._ply:]
+            self._moves.append(move & MOVE_MASK)
+            self._captures.append(move_captured(move))
+        self._ply += 1
+
+    def step_back(self):
+        """Moves the cursor back one move and returns that move, or None if at the start."""
+        if self._ply == 0:
+            return None
+        self._ply -= 1
+        return self._moves[self._ply] | (self._captures[self._ply] << 16)
+
+    def next_move(self):
+        """Returns the next undone move that can be redone, or None if at the end."""
+        if self._ply == len(self._moves):
+            return None
+        return self._moves[self._ply] | (self._captures[self._ply] << 16)
@@ -0,0 +1,338 @@
+# Description: Small neural network evaluation of XiangQi positions in the style of NNUE. The first layer is an
+#  accumulator: the sum of one weight row for every piece on the board, kept from each side's point of view. An
+#  NnueEvaluator follows a XiangqiGame as a listener and updates the accumulators from the piece moved and the piece
+#  captured, so only a few rows are added and taken away per move. The small layers after it are NumPy matrix
+#  products and can evaluate a whole batch of positions at once. The weights are one flat float32 .npy file that is
+#  memory-mapped rather than read in.
+#  Run with: python nnue.py [weights.npy] to compare incremental and from-scratch evaluation speed.
+
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from move import NO_PIECE, RED, BLACK, piece_code, move_from, move_to, move_captured
+
+FEATURES = 2 * 7 * 90  # Own and enemy pieces of each of the 7 kinds on each of the 90 squares
+HIDDEN = 128  # Size of each side's accumulator
+LAYER_SIZES = (2 * HIDDEN, 32, 32, 1)  # Inputs and outputs of the layers after the accumulators
+OUTPUT_SCALE = 600.0  # Multiplies the network's output to give a score in evaluation.PIECE_VALUES units
+
+DEFAULT_WEIGHTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nnue.npy")
+
+
+def weight_shapes():
+    """Returns the shapes of the weight arrays in the order they are stored in a weights file."""
+    shapes = [(FEATURES, HIDDEN), (HIDDEN,)]
+    for num in range(len(LAYER_SIZES) - 1):
+        shapes.append((LAYER_SIZES[num], LAYER_SIZES[num + 1]))
+        shapes.append((LAYER_SIZES[num + 1],))
+    return shapes
+
+
+def weight_count():
+    """Returns the number of float32 values in a weights file."""
+    return sum(int(np.prod(shape)) for shape in weight_shapes())
+
+
+def init_weights(path, seed=0):
+    """
+    Writes a weights file of small random weights, a starting point for training or for benchmarks.
+    :param path: file to write
+    :param seed: seed of the random weights
+    """
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for shape in weight_shapes():
+        if len(shape) == 1:
+            arrays.append(np.zeros(shape, dtype=np.float32))
+        else:
+            arrays.append(rng.normal(0.0, 1.0 / np.sqrt(shape[0] if shape[0] != FEATURES else 32), shape)
+                          .astype(np.float32))
+    np.save(path, np.concatenate([array.ravel() for array in arrays]))
+
+
+def feature_table():
+    """
+    Returns the input feature of each piece on each square from each side's point of view, as a list indexed by
+    side of lists indexed by piece code (kind + 8 for black) of lists indexed by square. Black sees the board
+    turned so its own back rank is row 0.
+    """
+    table = [[[0] * 90 for code in range(16)] for side in (RED, BLACK)]
+    for side in (RED, BLACK):
+        for code in range(16):
+            kind = code & 7
+            if kind == NO_PIECE:
+                continue
+            enemy = 0 if code >> 3 == side else 1
+            for sq in range(90):
+                row = sq // 9 if side == RED else 9 - sq // 9
+                table[side][code][sq] = (enemy * 7 + kind - 1) * 90 + row * 9 + sq % 9
+    return table
+
+
+FEATURE_TABLE = feature_table()
+
+# Red's and black's input features of each piece code on each square together, the rows a move adds or takes away
+FEATURE_PAIRS = [[[FEATURE_TABLE[RED][code][sq], FEATURE_TABLE[BLACK][code][sq]] for sq in range(90)]
+                 for code in range(16)]
+
+
+def active_features(squares, side):
+    """Returns the input features of every piece on a board of piece codes, from one side's point of view."""
+    table = FEATURE_TABLE[side]
+    return [table[code][sq] for sq, code in enumerate(squares) if code != NO_PIECE]
+
+
+class NnueNetwork:
+    """The weights of the network, as views into one flat array, with the layers after the accumulators."""
+
+    def __init__(self, weights):
+        """Splits a flat float32 array of weight_count() values into the weights of each layer."""
+        weights = np.asarray(weights)  # A plain array over the same memory, a memmap is slow to index and multiply
+        arrays = []
+        start = 0
+        for shape in weight_shapes():
+            size = int(np.prod(shape))
+            arrays.append(weights[start:start + size].reshape(shape))
+            start += size
+        self._feature_weights = arrays[0]
+        self._feature_bias = arrays[1]
+        self._layers = [(arrays[num], arrays[num + 1]) for num in range(2, len(arrays), 2)]
+        # First layer weights for inputs with the side to move's accumulator second, so no reordering is needed
+        first = self._layers[0][0]
+        self._swapped_first = np.concatenate((first[HIDDEN:], first[:HIDDEN]))
+
+    def get_feature_weights(self):
+        """Returns the accumulator weights, one row per input feature."""
+        return self._feature_weights
+
+    def accumulate(self, features):
+        """Returns an accumulator computed from scratch from a list of input features."""
+        return self._feature_bias + self._feature_weights[features].sum(axis=0)
+
+    def forward(self, inputs, swapped=False):
+        """
+        Runs the layers after the accumulators on one position or a batch of positions. The accumulators are
+        clipped to 0..1 and the hidden layers use ReLU.
+        :param inputs: array of shape (2 * HIDDEN,) or (positions, 2 * HIDDEN): the accumulator of the side to move
+            followed by the other side's
+        :param swapped: True if the other side's accumulator comes first instead
+        :return: the score for the side to move, or an array of them for a batch
+        """
+        values = np.maximum(inputs, 0.0)
+        np.minimum(values, 1.0, out=values)
+        last = len(self._layers) - 1
+        for num, (weights, bias) in enumerate(self._layers):
+            if num == 0 and swapped:
+                weights = self._swapped_first
+            values = np.dot(values, weights)
+            values += bias
+            if num < last:
+                np.maximum(values, 0.0, out=values)
+        return values[..., 0] * OUTPUT_SCALE
+
+    def evaluate_batch(self, accumulators, sides):
+        """
+        Returns the scores of a batch of positions for their side to move.
+        :param accumulators: array of shape (positions, 2, HIDDEN) of red's and black's accumulators
+        :param sides: sequence of the color to move in each position (0 red, 1 black)
+        """
+        sides = np.asarray(sides)
+        rows = np.arange(len(sides))
+        inputs = np.concatenate((accumulators[rows, sides], accumulators[rows, 1 - sides]), axis=1)
+        return self.forward(inputs)
+
+    def evaluate_squares(self, squares, side):
+        """Evaluates a board of piece codes from scratch for the side to move, without any accumulators."""
+        inputs = np.concatenate((self.accumulate(active_features(squares, side)),
+                                 self.accumulate(active_features(squares, 1 - side))))
+        return int(self.forward(inputs))
+
+
+def load_network(path=DEFAULT_WEIGHTS):
+    """
+    Returns the network stored in a weights file, memory-mapped so only the rows that are used are read from disk.
+    :return: the NnueNetwork, or None if the file is missing or is not a weights file of the right size
+    """
+    if not os.path.exists(path):
+        return None
+    weights = np.load(path, mmap_mode="r")
+    if weights.dtype != np.float32 or weights.shape != (weight_count(),):
+        return None
+    return NnueNetwork(weights)
+
+
+class NnueEvaluator:
+    """
+    Neural network evaluation of a XiangqiGame, used like evaluation.Evaluator. Keeps its own copy of the board as
+    piece codes and a stack of accumulators, one entry per move followed, so taking a move back restores the exact
+    accumulators from before it.
+    """
+
+    def __init__(self, game, network):
+        """Creates an evaluator for the current position of a game and starts following its moves."""
+        self._network = network
+        self._rows = network.get_feature_weights()
+        self._squares = [NO_PIECE] * 90
+        self._stack = []  # Accumulators of red and black, shape (2, HIDDEN), after each move followed
+        self._side = RED  # Color to move
+        self.position_set(game)
+        game.add_listener(self)
+
+    def evaluate(self):
+        """Returns the score of the position from the point of view of the color to move."""
+        return int(self._network.forward(self._stack[-1].ravel(), self._side == BLACK))
+
+    def get_squares(self):
+        """Returns the evaluator's copy of the board as piece codes indexed by square. Do not change it."""
+        return self._squares
+
+    def get_accumulators(self):
+        """Returns red's and black's accumulators for the current position. Do not change them."""
+        return self._stack[-1]
+
+    def get_side(self):
+        """Returns the color to move, 0 for red and 1 for black."""
+        return self._side
+
+    def position_set(self, game):
+        """Computes the accumulators from scratch for the current position of a game."""
+        board = game.get_board()
+        for row in range(10):
+            for col in range(9):
+                piece = board[row][col]
+                code = NO_PIECE
+                if piece != "_______":
+                    code = piece_code(piece)
+                self._squares[row * 9 + col] = code
+
+        network = self._network
+        self._stack = [np.array((network.accumulate(active_features(self._squares, RED)),
+                                 network.accumulate(active_features(self._squares, BLACK))), dtype=np.float32)]
+        self._side = RED if game.get_current_player().get_player_color() == "red" else BLACK
+
+    def move_made(self, move):
+        """Pushes the accumulators after a move: the moved piece's rows are swapped and a captured piece's removed."""
+        squares = self._squares
+        from_sq = move_from(move)
+        to_sq = move_to(move)
+        code = squares[from_sq]
+        captured = squares[to_sq]
+
+        rows = self._rows
+        pairs = FEATURE_PAIRS[code]
+        accumulators = self._stack[-1] + rows[pairs[to_sq]]
+        accumulators -= rows[pairs[from_sq]]
+        if captured != NO_PIECE:
+            accumulators -= rows[FEATURE_PAIRS[captured][to_sq]]
+        self._stack.append(accumulators)
+
+        squares[from_sq] = NO_PIECE
+        squares[to_sq] = code
+        self._side = 1 - self._side
+
+    def move_undone(self, move):
+        """Pops the accumulators pushed by a move."""
+        squares = self._squares
+        from_sq = move_from(move)
+        to_sq = move_to(move)
+        code = squares[to_sq]
+        captured = NO_PIECE
+        if move_captured(move) != NO_PIECE:
+            captured = move_captured(move) + (8 if code < 8 else 0)  # The captured piece was the other color
+
+        if len(self._stack) > 1:
+            self._stack.pop()
+        else:
+            # The move was made before this evaluator started following the game, so work back from it instead
+            accumulators = self._stack[0]
+            accumulators += self._rows[FEATURE_PAIRS[code][from_sq]]
+            accumulators -= self._rows[FEATURE_PAIRS[code][to_sq]]
+            if captured != NO_PIECE:
+                accumulators += self._rows[FEATURE_PAIRS[captured][to_sq]]
+
+        squares[from_sq] = code
+        squares[to_sq] = captured
+        self._side = 1 - self._side
+
+
+def benchmark(path=None, positions=20000, seed=1):
+    """
+    Times incremental, from-scratch and batched evaluation over the positions of random games and prints the
+    positions per second of each.
+    :param path: weights file, or None to use random weights written to a temporary file
+    :param positions: number of positions to evaluate
+    :param seed: seed of the random games
+    :return: dictionary of positions per second by method
+    """
+    from xiangqi import XiangqiGame
+
+    temporary = None
+    if path is None:
+        temporary = tempfile.NamedTemporaryFile(suffix=".npy", delete=False)
+        temporary.close()
+        path = temporary.name
+        init_weights(path)
+    network = load_network(path)
+    if network is None:
+        print("Not a weights file:", path)
+        return None
+
+    # Collect the moves of random games, which start over from the opening when they end
+    rng = random.Random(seed)
+    game = XiangqiGame()
+    games = [[]]
+    for num in range(positions):
+        moves = game.legal_move_list()
+        if not moves or len(games[-1]) >= 150:
+            game = XiangqiGame()
+            games.append([])
+            moves = game.legal_move_list()
+        move = rng.choice(moves)
+        game.push_move(move)
+        games[-1].append(move)
+
+    results = {}
+
+    # Incremental: follow each game move by move and evaluate after every move
+    accumulators = []
+    sides = []
+    scratch = []
+    elapsed = 0.0
+    for moves in games:
+        game = XiangqiGame()
+        evaluator = NnueEvaluator(game, network)
+        game.remove_listener(evaluator)  # The moves are given to the evaluator directly, without the game's work
+        for move in moves:
+            start = time.perf_counter()
+            evaluator.move_made(move)
+            evaluator.evaluate()
+            elapsed += time.perf_counter() - start
+            accumulators.append(evaluator.get_accumulators())
+            sides.append(evaluator.get_side())
+            scratch.append((list(evaluator.get_squares()), evaluator.get_side()))
+    results["incremental"] = len(sides) / elapsed
+
+    # From scratch: build both accumulators from the whole board for every position
+    start = time.perf_counter()
+    for squares, side in scratch:
+        network.evaluate_squares(squares, side)
+    results["scratch"] = len(scratch) / (time.perf_counter() - start)
+
+    # Batched: the layers after the accumulators run once on all the positions
+    stacked = np.array(accumulators)
+    start = time.perf_counter()
+    network.evaluate_batch(stacked, sides)
+    results["batched"] = len(sides) / (time.perf_counter() - start)
+
+    for name, rate in results.items():
+        print("%-12s %10.0f positions/s" % (name, rate))
+    if temporary is not None:
+        os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,6 +1,8 @@
 class Piece:
     """Represents a piece on the game board."""
 
+    _move_offsets = ()  # (row, column) steps of the piece's movement pattern, see candidate_positions()
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new Piece on the board."""
         self._name = name
@@ -29,10 +31,21 @@ class Piece:
         """Returns the Player that owns the piece."""
         return self._player
 
+    def candidate_positions(self):
+        """
+        Returns the positions on the board the piece could reach by its movement pattern alone, ignoring blocking
+        pieces and its other rules. Only these positions need a legal_move_test when looking for legal moves.
+        """
+        cp = self._position
+        return [[cp[0] + offset[0], cp[1] + offset[1]] for offset in self._move_offsets
+                if 0 <= cp[0] + offset[0] <= 9 and 0 <= cp[1] + offset[1] <= 8]
+
 
 class General(Piece):
     """Represents the General piece on the board."""
 
+    _move_offsets = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new General piece."""
         super().__init__(name, pos, red_or_black, player, board)
@@ -68,6 +81,8 @@ class General(Piece):
 class Advisor(Piece):
     """Represents the Advisor Piece on the board."""
 
+    _move_offsets = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new Advisor piece."""
         super().__init__(name, pos, red_or_black, player, board)
@@ -92,8 +107,8 @@ class Advisor(Piece):
                 return False
 
         # Check if move is diagonal
-        if new_pos == [cp[0] + 1, cp[1] + 1] or new_pos == [cp[0] - 1, cp[1] + 1] or new_pos == [cp[0] + 1, cp[
-                1] + 1] or new_pos == [
+        if new_pos == [cp[0] + 1, cp[1] + 1] or new_pos == [cp[0] - 1, cp[1] + 1] or new_pos == [cp[0] - 1, cp[
+                1] - 1] or new_pos == [
                 cp[0] + 1, cp[1] - 1]:
             return True
 
@@ -104,6 +119,8 @@ class Advisor(Piece):
 class Elephant(Piece):
     """Represents the Elephant Piece on the board."""
 
+    _move_offsets = ((2, 2), (2, -2), (-2, 2), (-2, -2))
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new Elephant piece."""
         super().__init__(name, pos, red_or_black, player, board)
@@ -145,6 +162,8 @@ class Elephant(Piece):
 class Horse(Piece):
     """Represents the Horse Piece on the board."""
 
+    _move_offsets = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (-1, 2), (1, -2), (-1, -2))
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new Horse piece."""
         super().__init__(name, pos, red_or_black, player, board)
@@ -186,6 +205,12 @@ class Chariot(Piece):
         """Creates a new Chariot piece."""
         super().__init__(name, pos, red_or_black, player, board)
 
+    def candidate_positions(self):
+        """Returns every other position in the piece's row and column."""
+        cp = self._position
+        return [[cp[0], col] for col in range(9) if col != cp[1]] + \
+               [[row, cp[1]] for row in range(10) if row != cp[0]]
+
     def legal_move_test(self, new_pos, num=1):
         """
         Tests if an intended move is legal for the piece.
@@ -250,6 +275,12 @@ class Cannon(Piece):
         """Creates a new Cannon piece."""
         super().__init__(name, pos, red_or_black, player, board)
 
+    def candidate_positions(self):
+        """Returns every other position in the piece's row and column."""
+        cp = self._position
+        return [[cp[0], col] for col in range(9) if col != cp[1]] + \
+               [[row, cp[1]] for row in range(10) if row != cp[0]]
+
     def legal_move_test(self, new_pos, num=1, tracker=0):
         """
         Tests if an intended move is legal for the piece.
@@ -386,11 +417,19 @@ class Cannon(Piece):
 class Soldier(Piece):
     """Represents a Soldier Piece on the board."""
 
+    _move_offsets = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
     def __init__(self, name, pos, red_or_black, player, board):
         """Creates a new General piece."""
         super().__init__(name, pos, red_or_black, player, board)
         self._past_river = False
 
+    def set_position(self, pos):
+        """Sets the new position of the soldier and updates whether it is past the river. Needed for undo."""
+        super().set_position(pos)
+        self._past_river = False
+        self.past_river_check()
+
     def past_river_check(self):
         """Checks if the soldier is past the river."""
         if self._color == "red":
@@ -26,11 +26,21 @@ class Player:
 
     def piece_taken(self, piece):
         """Removes a piece from active to inactive lists when taken by opponent."""
-        self._inactive_pieces.append(piece)
-        self._active_pieces.remove(piece)
+        self.piece_removed(piece)
         debug(piece.get_name() + " taken.")
         return True
 
+    def piece_removed(self, piece):
+        """Removes a taken piece from active to inactive lists without announcing it. Used by search."""
+        self._inactive_pieces.append(piece)
+        self._active_pieces.remove(piece)
+
+    def piece_restored(self):
+        """Moves the most recently taken piece back to the active pieces list when its capture is undone."""
+        piece = self._inactive_pieces.pop()
+        self._active_pieces.append(piece)
+        return piece
+
     def get_active_pieces(self):
         """Returns the list of active pieces of the Player."""
         return self._active_pieces
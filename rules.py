@@ -0,0 +1,109 @@
+# Description: Repetition rules of the XiangQi game. When a position comes back for the third time, the moves of the
+#  cycle that led back to it are classified for each side as checks, chases or idle moves. A side that gives check
+#  with every move of the cycle (perpetual check) loses, as does a side that chases an unprotected piece with every
+#  move while the other side makes idle moves (perpetual chase). Any other repetition is a draw.
+#  This is a simplified form of the Asian rules: a chase is a move after which the moved piece attacks an enemy
+#  piece other than the General that is unprotected or worth more than the attacker. Pins are not considered, and
+#  Generals and Soldiers do not chase.
+
+from exchange import EXCHANGE_VALUES, attackers
+from move import NO_PIECE, GENERAL, SOLDIER, move_from, move_to
+
+REPETITION_LIMIT = 3  # Times a position must occur before the repetition is adjudicated
+
+CHECK = "CHECK"  # Every move of the cycle gave check
+CHASE = "CHASE"  # Every move of the cycle gave check or chased a piece, and at least one chased
+IDLE = "IDLE"  # Any other cycle
+
+
+def gives_check(squares, color):
+    """Returns True if a color (0 red, 1 black) attacks the enemy General on a board of piece codes."""
+    general = GENERAL + ((1 - color) << 3)
+    for sq, code in enumerate(squares):
+        if code == general:
+            return len(attackers(squares, sq, color)) > 0
+    return False
+
+
+def chases(squares, sq):
+    """
+    Returns True if the piece on a square attacks an enemy piece that is not its General and that is unprotected or
+    worth more than the attacking piece.
+    :param squares: the board as piece codes (kind + 8 for black) indexed by square
+    :param sq: the square of the attacking piece
+    """
+    code = squares[sq]
+    kind = code & 7
+    if kind == GENERAL or kind == SOLDIER:
+        return False
+    color = code >> 3
+    for target, target_code in enumerate(squares):
+        if target_code == NO_PIECE or target_code >> 3 == color or target_code & 7 == GENERAL:
+            continue
+        if sq not in attackers(squares, target, color):
+            continue
+        if EXCHANGE_VALUES[target_code & 7] > EXCHANGE_VALUES[kind]:
+            return True
+        # The target is protected if its own side could take back on its square after the capture
+        squares[target] = code
+        squares[sq] = NO_PIECE
+        protected = len(attackers(squares, target, 1 - color)) > 0
+        squares[sq] = code
+        squares[target] = target_code
+        if not protected:
+            return True
+    return False
+
+
+def classify_cycle(squares, moves, side):
+    """
+    Classifies the moves each side made in a cycle of moves that returns to the same position.
+    :param squares: the board at the start of the cycle as piece codes. It is not changed.
+    :param moves: the packed moves of the cycle, none of them a capture
+    :param side: the color to move at the start of the cycle, 0 red and 1 black
+    :return: list of the CHECK, CHASE or IDLE classification of red and of black
+    """
+    squares = list(squares)
+    checks = [True, True]
+    chased = [False, False]
+    idle = [False, False]
+    color = side
+    for move in moves:
+        squares[move_to(move)] = squares[move_from(move)]
+        squares[move_from(move)] = NO_PIECE
+        if gives_check(squares, color):
+            pass
+        elif chases(squares, move_to(move)):
+            checks[color] = False
+            chased[color] = True
+        else:
+            checks[color] = False
+            idle[color] = True
+        color = 1 - color
+
+    kinds = []
+    for color in (0, 1):
+        if idle[color]:
+            kinds.append(IDLE)
+        elif checks[color]:
+            kinds.append(CHECK)
+        else:
+            kinds.append(CHASE)
+    return kinds
+
+
+def repetition_result(red, black):
+    """
+    Returns the game state after a repetition in which red's and black's moves were classified as given.
+    :return: "RED_WON_PERPETUAL_CHECK", "BLACK_WON_PERPETUAL_CHECK", "RED_WON_PERPETUAL_CHASE",
+        "BLACK_WON_PERPETUAL_CHASE" or "DRAW_REPETITION"
+    """
+    if red == CHECK and black != CHECK:
+        return "BLACK_WON_PERPETUAL_CHECK"
+    if black == CHECK and red != CHECK:
+        return "RED_WON_PERPETUAL_CHECK"
+    if red == CHASE and black == IDLE:
+        return "BLACK_WON_PERPETUAL_CHASE"
+    if black == CHASE and red == IDLE:
+        return "RED_WON_PERPETUAL_CHASE"
+    return "DRAW_REPETITION"
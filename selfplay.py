@@ -0,0 +1,286 @@
+# Description: Self-play training data for evaluation models. Worker processes play headless games of the engine
+#  against itself and send back every position as int8 planes with the side to move and the game's result. The main
+#  process appends them to a directory of fixed-size .npy shards, written through memory maps, with an index.json
+#  listing the shards. Only the shard being filled and a bounded queue of finished games are ever held, so memory
+#  stays the same however large the dataset grows.
+#  Run with: python selfplay.py <directory> [--games N] [--workers N] [--depth N]
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import time
+import numpy as np
+from xiangqi import XiangqiGame
+from engine import Searcher
+from move import encode_move
+
+PLANES = 14  # One plane per piece kind (7) and color (2): red's pieces first, then black's
+POSITION_DTYPE = np.dtype([("planes", np.int8, (PLANES, 10, 9)),
+                           ("side", np.int8),  # Color to move, 0 red and 1 black
+                           ("result", np.int8)])  # Result for the side to move: 1 win, 0 draw, -1 loss
+
+SHARD_SIZE = 65536  # Positions in each shard file
+QUEUE_GAMES = 16  # Finished games waiting to be written before the workers wait for the writer
+TASKS_PER_WORKER = 2  # Seeds waiting on the task queue for each worker, more are added as games finish
+DEFAULT_DEPTH = 1  # Plies searched for each move
+RANDOM_PLIES = 8  # Opening moves played at random so the games differ
+MAX_PLIES = 200  # Games still going after this many plies are scored as draws
+REPORT_SECONDS = 5.0  # Seconds between progress reports
+WORKER_CHECK_SECONDS = 1.0  # Seconds without a finished game before checking that the workers are still running
+INDEX_FILE = "index.json"
+
+
+def encode_position(game):
+    """Returns the board of a game as an int8 array of shape (PLANES, 10, 9), 1 where a piece is and 0 elsewhere."""
+    codes = np.array(game.get_squares())
+    occupied = np.nonzero(codes)[0]
+    planes = np.zeros((PLANES, 90), dtype=np.int8)
+    planes[(codes[occupied] >> 3) * 7 + (codes[occupied] & 7) - 1, occupied] = 1
+    return planes.reshape(PLANES, 10, 9)
+
+
+def play_game(searcher, rng, depth=DEFAULT_DEPTH, random_plies=RANDOM_PLIES, max_plies=MAX_PLIES):
+    """
+    Plays one game of the engine against itself and returns its positions.
+    :param searcher: the Searcher choosing the moves
+    :param rng: random.Random choosing the opening moves
+    :return: array of POSITION_DTYPE, one entry for the position before each move. A game ends with checkmate or
+        stalemate, by the repetition rules, or as a draw after max_plies.
+    """
+    game = XiangqiGame()
+    game.set_bounded_history(True)
+    positions = []
+    sides = []
+    winner = None  # Color of the winner, None for a draw
+    for ply in range(max_plies):
+        side = 0 if game.get_current_player().get_player_color() == "red" else 1
+        legal_moves = game.legal_moves()
+        if not legal_moves:  # Checkmate or stalemate, both lose
+            winner = 1 - side
+            break
+        positions.append(encode_position(game))
+        sides.append(side)
+        if ply < random_plies:
+            from_sq = rng.choice(sorted(legal_moves))
+            move = encode_move(from_sq, rng.choice(legal_moves[from_sq]))
+        else:
+            move, score = searcher.search(game, depth)
+        game.push_move(move)
+
+        # Stop games that go round in circles, scored by the repetition rules
+        state = game.repetition_state()
+        if state != "UNFINISHED":
+            if state.startswith("RED_WON"):
+                winner = 0
+            elif state.startswith("BLACK_WON"):
+                winner = 1
+            break
+
+    data = np.zeros(len(positions), dtype=POSITION_DTYPE)
+    if positions:
+        data["planes"] = positions
+        data["side"] = sides
+        if winner is not None:
+            data["result"] = np.where(data["side"] == winner, 1, -1)
+    return data
+
+
+def _feed_tasks(tasks, sent, games, workers, seed):
+    """
+    Puts the seeds of the games not yet handed out on the task queue, followed by a None for each worker, until the
+    queue is full.
+    :param sent: number of seeds and Nones already put on the queue
+    :return: the new number put on the queue
+    """
+    while sent < games + workers:
+        try:
+            tasks.put_nowait(seed + sent if sent < games else None)
+        except queue.Full:
+            break
+        sent += 1
+    return sent
+
+
+def _worker(tasks, results, depth, random_plies, max_plies):
+    """Worker process: plays a game for each seed taken from the task queue until it gets None."""
+    searcher = Searcher()
+    while True:
+        seed = tasks.get()
+        if seed is None:
+            results.put(None)
+            return
+        results.put(play_game(searcher, random.Random(seed), depth, random_plies, max_plies))
+
+
+class DatasetWriter:
+    """
+    Appends positions to a directory of .npy shards of SHARD_SIZE positions each. A shard is written through a
+    memory map and index.json is rewritten each time a shard is finished, so an interrupted run leaves a usable
+    dataset. Opening a directory that already has an index adds new shards after the existing ones.
+    """
+
+    def __init__(self, directory, shard_size=SHARD_SIZE):
+        """Opens or creates the dataset in a directory."""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._shard_size = shard_size
+        self._index = {"dtype": POSITION_DTYPE.descr, "shards": [], "games": 0, "positions": 0}
+        path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(path):
+            with open(path) as index_file:
+                self._index = json.load(index_file)
+        self._shard = None  # Memory map of the shard being filled
+        self._count = 0  # Positions in the shard being filled
+
+    def get_positions(self):
+        """Returns the number of positions in the dataset, including the ones not yet in the index."""
+        return self._index["positions"] + self._count
+
+    def add_game(self, data):
+        """Appends the positions of a game, an array of POSITION_DTYPE."""
+        start = 0
+        while start < len(data):
+            if self._shard is None:
+                name = "shard_%05d.npy" % len(self._index["shards"])
+                self._shard = np.lib.format.open_memmap(os.path.join(self._directory, name), mode="w+",
+                                                        dtype=POSITION_DTYPE, shape=(self._shard_size,))
+                self._count = 0
+            size = min(len(data) - start, self._shard_size - self._count)
+            self._shard[self._count:self._count + size] = data[start:start + size]
+            self._count += size
+            start += size
+            if self._count == self._shard_size:
+                self._finish_shard()
+        self._index["games"] += 1
+
+    def close(self):
+        """Finishes the shard being filled, if any, and writes the index."""
+        if self._shard is not None:
+            self._finish_shard()
+        else:
+            self._write_index()
+
+    def _finish_shard(self):
+        """Flushes the shard being filled to disk and adds it to the index."""
+        self._shard.flush()
+        path = self._shard.filename
+        if self._count < self._shard_size:
+            # Cut a shard that was not filled down to the positions it holds
+            with open(path + ".tmp", "wb") as shard_file:
+                np.save(shard_file, self._shard[:self._count])
+            os.replace(path + ".tmp", path)
+        self._shard = None
+        name = os.path.basename(path)
+        self._index["shards"].append({"file": name, "positions": self._count})
+        self._index["positions"] += self._count
+        self._count = 0
+        self._write_index()
+
+    def _write_index(self):
+        """Writes index.json, replacing the old one only once the new one is complete."""
+        path = os.path.join(self._directory, INDEX_FILE)
+        with open(path + ".tmp", "w") as index_file:
+            json.dump(self._index, index_file, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+def load_dataset(directory):
+    """
+    Returns the shards of a dataset as read-only memory-mapped arrays of POSITION_DTYPE, each cut to the positions
+    it holds. Returns an empty list if the directory has no index.
+    """
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as index_file:
+        index = json.load(index_file)
+    return [np.load(os.path.join(directory, shard["file"]), mmap_mode="r")[:shard["positions"]]
+            for shard in index["shards"]]
+
+
+def run_selfplay(directory, games, workers=None, depth=DEFAULT_DEPTH, random_plies=RANDOM_PLIES,
+                 max_plies=MAX_PLIES, shard_size=SHARD_SIZE, seed=0, report=print):
+    """
+    Plays games on worker processes and appends their positions to a dataset.
+    :param directory: dataset directory, created if needed and added to if it exists
+    :param games: number of games to play
+    :param workers: number of worker processes, or None for one per CPU
+    :param depth: plies searched for each move
+    :param random_plies: opening moves played at random
+    :param max_plies: plies after which a game is scored as a draw
+    :param shard_size: positions in each shard file
+    :param seed: seed of the first game's random opening, the others use the following seeds
+    :param report: function given a progress line every REPORT_SECONDS, or None for no reports
+    :return: tuple of the positions written and the positions per second
+    :raises RuntimeError: if a worker process dies, e.g. from a crash or running out of memory. The positions of the
+        games finished before that are kept in the dataset.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Seeds are handed out a few at a time as games finish, so a long run does not queue all of them up front
+    tasks = multiprocessing.Queue(workers * TASKS_PER_WORKER)
+    results = multiprocessing.Queue(QUEUE_GAMES)  # Workers wait here when the writer falls behind
+    sent = _feed_tasks(tasks, 0, games, workers, seed)
+    processes = []
+    for num in range(workers):
+        process = multiprocessing.Process(target=_worker, args=(tasks, results, depth, random_plies, max_plies),
+                                          daemon=True)
+        process.start()
+        processes.append(process)
+
+    writer = DatasetWriter(directory, shard_size)
+    start = time.time()
+    last_report = start
+    written = 0
+    finished_workers = 0
+    finished_games = 0
+    try:
+        while finished_workers < workers:
+            sent = _feed_tasks(tasks, sent, games, workers, seed)
+            try:
+                data = results.get(timeout=WORKER_CHECK_SECONDS)
+            except queue.Empty:
+                # A worker that died never sends its None, so waiting on would never end
+                for num, process in enumerate(processes):
+                    if not process.is_alive() and process.exitcode != 0:
+                        raise RuntimeError("Self-play worker %d died with exit code %s" % (num, process.exitcode))
+                continue
+            if data is None:
+                finished_workers += 1
+                continue
+            writer.add_game(data)
+            written += len(data)
+            finished_games += 1
+            if report is not None and time.time() - last_report >= REPORT_SECONDS:
+                last_report = time.time()
+                report("%d/%d games, %d positions, %.0f positions/s" % (
+                    finished_games, games, written, written / (last_report - start)))
+    finally:
+        writer.close()
+        for process in processes:
+            process.terminate()
+            process.join()
+
+    rate = written / max(time.time() - start, 1e-9)
+    if report is not None:
+        report("%d games, %d positions, %.0f positions/s, %d positions in %s" % (
+            finished_games, written, rate, writer.get_positions(), directory))
+    return written, rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes self-play positions to a sharded dataset.")
+    parser.add_argument("directory", help="dataset directory, added to if it already exists")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="plies searched for each move")
+    parser.add_argument("--random-plies", type=int, default=RANDOM_PLIES, help="opening moves played at random")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES, help="plies before a game is a draw")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="positions in each shard file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    args = parser.parse_args()
+    run_selfplay(args.directory, args.games, args.workers, args.depth, args.random_plies, args.max_plies,
+                 args.shard_size, args.seed)
@@ -0,0 +1,30 @@
+# Description: Random games for the tests. A walk makes random legal moves in a game, taking a move back now and
+#  then, so the code under test sees captures, undos and redos in a repeatable order for a given seed.
+
+import contextlib
+import io
+
+
+def random_walk(game, rng, max_plies, undo_chance=0.0, play=False):
+    """
+    Plays a random game and yields after every step, so a test can check the game as it goes.
+    :param game: the XiangqiGame to play in
+    :param rng: random.Random choosing the moves
+    :param max_plies: most steps to take. The walk also stops when the side to move has no legal moves.
+    :param undo_chance: chance that a step takes the last move back instead of making one
+    :param play: True to make moves with play_move(), which also updates check statuses and the game state, False to
+        make them with push_move(). The debug messages the moves print are hidden.
+    :return: yields the number of the step, from 0
+    """
+    for step in range(max_plies):
+        moves = game.legal_move_list()
+        if not moves:
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            if undo_chance and rng.random() < undo_chance and game.get_history().get_ply() > 0:
+                game.undo_move()
+            elif play:
+                game.play_move(rng.choice(moves))
+            else:
+                game.push_move(rng.choice(moves))
+        yield step
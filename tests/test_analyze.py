@@ -0,0 +1,95 @@
+# Description: Tests of the batch analysis in analyze.py: results in input order with several workers, error entries
+#  for lines that are not positions, and the number of chunks read ahead of the output.
+
+import io
+import json
+import os
+import tempfile
+import unittest
+import analyze
+from analyze import run_analysis
+
+LINES = ["startpos", "startpos moves h2e2 h9g7", "1-0 h2e2 h9g7 e2e6", "b0c2 b9c7",
+         "fen R3k4/1R7/9/9/9/9/9/9/9/3K5 b - - 0 1", "4k4/9/9/9/9/9/9/9/9/3KR4 b - - 0 1",
+         "3k5/4R4/9/9/9/9/9/9/9/4K4 b - - 0 1"]
+INVALID_LINES = ["not a position", "startpos moves e0e5", "9/9 w - - 0 1", "startpos moves h2e2 zz"]
+REPEATS = 20  # Times the lines are repeated, so the input runs over many chunks
+
+
+class RecordingOutput(io.StringIO):
+    """An output that checks, at every line written, how many lines of input have been read ahead of it."""
+
+    def __init__(self, test, read, limit):
+        super().__init__()
+        self._test = test
+        self._read = read
+        self._limit = limit
+        self._written = 0
+
+    def write(self, text):
+        self._written += text.count("\n")
+        self._test.assertLessEqual(self._read[0] - self._written, self._limit)
+        return super().write(text)
+
+
+class AnalyzeTest(unittest.TestCase):
+    """Runs the analysis on small inputs."""
+
+    def analyze(self, lines, workers, tasks=("legal", "status")):
+        """Returns the results of analyzing lines, decoded from the JSON lines written."""
+        output = io.StringIO()
+        count = run_analysis([line + "\n" for line in lines], output, tasks, 1, workers)
+        self.assertEqual(count, len(lines))
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_order_with_workers(self):
+        lines = (LINES + INVALID_LINES) * REPEATS
+        results = self.analyze(lines, 2)
+        self.assertEqual([result["input"] for result in results], lines)
+        self.assertEqual(results, self.analyze(lines, 1))
+
+    def test_results(self):
+        results = self.analyze(LINES, 1, ("legal", "status", "bestmove"))
+        self.assertEqual(results[0]["legal_moves"], 44)
+        self.assertEqual(results[0]["status"], "normal")
+        self.assertEqual(results[1]["fen"], "rnbakab1r/9/1c4nc1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR w - - 0 2")
+        self.assertEqual([result["status"] for result in results[4:]], ["checkmate", "check", "stalemate"])
+        self.assertEqual([result["legal_moves"] for result in results[4:]], [0, 1, 0])
+        for result in results:
+            self.assertIn("bestmove", result)
+
+    def test_invalid_lines(self):
+        for result in self.analyze(INVALID_LINES, 1):
+            self.assertEqual(result["error"], "invalid position")
+            self.assertNotIn("legal_moves", result)
+
+    def test_chunks_in_flight(self):
+        read = [0]
+
+        def source():
+            for num in range(REPEATS * 10):
+                read[0] += 1
+                yield LINES[num % len(LINES)] + "\n"
+
+        workers = 2
+        limit = workers * analyze.CHUNKS_PER_WORKER * analyze.CHUNK_LINES
+        output = RecordingOutput(self, read, limit)
+        self.assertEqual(run_analysis(source(), output, ("legal",), 1, workers), REPEATS * 10)
+        self.assertEqual(len(output.getvalue().splitlines()), REPEATS * 10)
+
+    def test_main(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source = os.path.join(directory.name, "positions.txt")
+        output = os.path.join(directory.name, "results.jsonl")
+        with open(source, "w") as source_file:
+            source_file.write("\n".join(LINES) + "\n\n")
+        self.assertEqual(analyze.main([source, "-o", output, "--workers", "1", "--tasks", "legal"]), 0)
+        with open(output) as output_file:
+            results = [json.loads(line) for line in output_file]
+        self.assertEqual([result["input"] for result in results], LINES)
+        self.assertEqual(set(results[0]), {"input", "fen", "legal_moves"})
+
+
+if __name__ == "__main__":
+    unittest.main()
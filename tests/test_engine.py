@@ -0,0 +1,84 @@
+# Description: Tests of EngineDriver: the answer found while pondering is handed over when the reply is played, and
+#  the worker thread survives a search that raises.
+
+import contextlib
+import io
+import time
+import unittest
+from xiangqi import XiangqiGame
+from engine import EngineDriver, PONDER_REPLIES
+from move import MOVE_MASK, str_to_move
+
+TIMEOUT = 30.0  # Seconds to wait for the worker before failing
+
+
+def failing_search(*args, **kwargs):
+    """Stands in for Searcher.search to make the worker's search raise."""
+    raise RuntimeError("search failed")
+
+
+class EngineDriverTest(unittest.TestCase):
+    """Drives an EngineDriver searching one ply deep, so each search is quick."""
+
+    def setUp(self):
+        self.driver = EngineDriver(depth=1, movetime=None)
+        self.addCleanup(self.driver.close)
+        # The worker prints the traceback of a search that raises
+        quiet = contextlib.redirect_stderr(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def wait_for(self, test):
+        """Waits until a function returns True, failing the test if it takes longer than TIMEOUT."""
+        deadline = time.time() + TIMEOUT
+        while not test():
+            self.assertLess(time.time(), deadline, "timed out waiting for the engine")
+            time.sleep(0.01)
+
+    def wait_for_move(self):
+        """Waits for the answer to the last request and returns it."""
+        found = []
+
+        def ready():
+            move = self.driver.poll()
+            if move is not None:
+                found.append(move)
+            return bool(found) or not self.driver.is_waiting()
+
+        self.wait_for(ready)
+        return found[0] if found else None
+
+    def test_ponder_hands_over_answer(self):
+        game = XiangqiGame()
+        game.push_move(str_to_move("h2e2"))
+        self.driver.ponder(game)
+        self.wait_for(lambda: len(self.driver._ponder_results) == PONDER_REPLIES and self.driver._searching is None)
+
+        # The answer to a pondered reply is returned without searching again
+        position, answer = next(iter(self.driver._ponder_results.items()))
+        self.driver._searcher.search = failing_search
+        game.push_move(position[-1])
+        self.driver.request_move(game)
+        self.assertEqual(self.wait_for_move(), answer)
+        self.assertIn(answer & MOVE_MASK, game.legal_move_list())
+
+    def test_search_raising(self):
+        game = XiangqiGame()
+        search = self.driver._searcher.search
+        self.driver._searcher.search = failing_search
+        self.driver.request_move(game)
+        self.assertIsNone(self.wait_for_move())
+        self.assertFalse(self.driver.is_waiting())
+
+        # A failed ponder leaves the worker ready for the next request
+        self.driver.ponder(game)
+        self.wait_for(lambda: self.driver._commands.empty() and self.driver._searching is None)
+        self.driver._searcher.search = search
+        self.driver.request_move(game)
+        move = self.wait_for_move()
+        self.assertIsNotNone(move)
+        self.assertIn(move & MOVE_MASK, game.legal_move_list())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# Description: Tests that the incremental Evaluator in evaluation.py keeps the same totals as an evaluator set up from
+#  scratch, through random games with captures and undos from a fixed seed.
+
+import contextlib
+import io
+import random
+import unittest
+from xiangqi import XiangqiGame
+from evaluation import Evaluator
+from random_games import random_walk
+
+SEED = 5
+GAMES = 6
+MAX_PLIES = 120
+UNDO_CHANCE = 0.1
+
+
+def scratch_evaluation(game):
+    """Returns the score, board and totals of an evaluator set up from scratch for the current position."""
+    evaluator = Evaluator(game)
+    game.remove_listener(evaluator)
+    return evaluator.evaluate(), list(evaluator.get_squares()), list(evaluator.get_values())
+
+
+class EvaluatorTest(unittest.TestCase):
+    """Compares incremental evaluation with evaluation from scratch."""
+
+    def assert_same(self, evaluator, game, message):
+        self.assertEqual((evaluator.evaluate(), list(evaluator.get_squares()), list(evaluator.get_values())),
+                         scratch_evaluation(game), message)
+
+    def test_moves_and_undos(self):
+        rng = random.Random(SEED)
+        game = XiangqiGame()
+        evaluator = Evaluator(game)
+        for num in range(GAMES):
+            for step in random_walk(game, rng, MAX_PLIES, UNDO_CHANCE):
+                self.assert_same(evaluator, game, "after step %d of game %d" % (step + 1, num))
+            with contextlib.redirect_stdout(io.StringIO()):
+                while game.undo_move():
+                    self.assert_same(evaluator, game, "after undoing game %d" % num)
+
+    def test_load_fen(self):
+        game = XiangqiGame()
+        evaluator = Evaluator(game)
+        game.load_fen("4k4/9/4b4/1R7/5p3/9/3N5/5K3/1C7/9 w - - 0 1")
+        self.assert_same(evaluator, game, "after load_fen")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+# Description: Tests of the static exchange evaluation in exchange.py: the attackers it finds agree with the piece
+#  rules on random positions, and exchanges come out right when a capture gives a cannon a screen, takes one away or
+#  frees a horse's leg.
+
+import random
+import unittest
+from xiangqi import XiangqiGame
+from exchange import EXCHANGE_VALUES, attackers, least_valuable_attacker, exchange_on_squares, static_exchange
+from move import NO_PIECE, GENERAL, ADVISOR, HORSE, CHARIOT, CANNON, SOLDIER, SQUARE_POSITIONS, square, move_from, \
+    move_to
+from random_games import random_walk
+
+SEED = 3
+GAMES = 8
+MAX_PLIES = 150
+BLACK_PIECE = 8  # Added to a piece kind for the code of a black piece
+
+
+def make_squares(pieces):
+    """Returns a board of piece codes holding only the pieces given as a dictionary of (row, column) to code."""
+    squares = [NO_PIECE] * 90
+    for (row, col), code in pieces.items():
+        squares[square(row, col)] = code
+    return squares
+
+
+def full_exchange(squares, sq, color, forced=True):
+    """
+    Returns the material won by a color going on capturing on a square, trying every stopping point instead of
+    cutting the exchange short. Only the first capture is forced.
+    """
+    attacker = least_valuable_attacker(squares, sq, color)
+    if attacker is None:
+        return 0
+    squares = list(squares)
+    won = EXCHANGE_VALUES[squares[sq] & 7]
+    squares[sq] = squares[attacker]
+    squares[attacker] = NO_PIECE
+    won -= full_exchange(squares, sq, 1 - color, False)
+    return won if forced else max(won, 0)
+
+
+class AttackersTest(unittest.TestCase):
+    """Compares attackers() with the legal moves and the pieces' own move tests on random positions."""
+
+    def test_random_positions(self):
+        rng = random.Random(SEED)
+        for num in range(GAMES):
+            game = XiangqiGame()
+            for step in random_walk(game, rng, MAX_PLIES):
+                squares = game.get_squares()
+                grid = game.get_board()
+
+                # Every legal capture is made by one of the attackers found
+                for move in game.legal_move_list():
+                    from_sq = move_from(move)
+                    to_sq = move_to(move)
+                    if squares[to_sq] != NO_PIECE:
+                        self.assertIn(from_sq, attackers(squares, to_sq, squares[from_sq] >> 3),
+                                      "capture %d-%d missed in %s" % (from_sq, to_sq, game.get_fen()))
+
+                # Every attacker found may move to the square by the rules of its piece
+                for sq in range(90):
+                    if squares[sq] == NO_PIECE:
+                        continue
+                    row, col = SQUARE_POSITIONS[sq]
+                    for from_sq in attackers(squares, sq, 1 - (squares[sq] >> 3)):
+                        from_row, from_col = SQUARE_POSITIONS[from_sq]
+                        piece = grid[from_row][from_col]
+                        self.assertTrue(piece.legal_move_test([row, col]), "%s on %d cannot capture on %d in %s" % (
+                            piece.get_name(), from_sq, sq, game.get_fen()))
+
+
+class ExchangeTest(unittest.TestCase):
+    """Works out exchanges on small boards whose best line of captures is known."""
+
+    def test_cannon_gains_screen(self):
+        # The soldier takes the cannon and leaves the horse alone between the red cannon and the square, so the
+        # black chariot would be taken if it took the soldier back
+        squares = make_squares({(1, 4): CANNON, (3, 4): HORSE, (4, 4): SOLDIER, (5, 4): CANNON + BLACK_PIECE,
+                                (9, 4): CHARIOT + BLACK_PIECE})
+        self.assertEqual(attackers(squares, square(5, 4), 0), [square(4, 4)])
+        self.assertEqual(exchange_on_squares(squares, square(5, 4)), 450)
+
+    def test_cannon_loses_screen(self):
+        # The soldier is the cannon's only screen, so once it has captured the cannon cannot follow
+        squares = make_squares({(1, 4): CANNON, (4, 4): SOLDIER, (5, 4): CANNON + BLACK_PIECE,
+                                (9, 4): CHARIOT + BLACK_PIECE})
+        self.assertEqual(sorted(attackers(squares, square(5, 4), 0)), [square(1, 4), square(4, 4)])
+        self.assertEqual(exchange_on_squares(squares, square(5, 4)), 450 - 100)
+
+    def test_horse_leg_freed(self):
+        # The advisor blocks the horse's leg until it captures, then the horse guards the square
+        squares = make_squares({(0, 2): HORSE, (0, 3): ADVISOR, (1, 4): SOLDIER + BLACK_PIECE,
+                                (9, 4): CHARIOT + BLACK_PIECE})
+        self.assertEqual(attackers(squares, square(1, 4), 0), [square(0, 3)])
+        self.assertEqual(exchange_on_squares(squares, square(1, 4)), 100)
+
+        squares[square(0, 2)] = NO_PIECE
+        self.assertEqual(exchange_on_squares(squares, square(1, 4)), 100 - 200)
+
+    def test_general_only_when_safe(self):
+        soldier = {(0, 4): GENERAL, (1, 4): SOLDIER + BLACK_PIECE}
+        self.assertEqual(exchange_on_squares(make_squares(soldier), square(1, 4)), 100)
+
+        # Defended by the chariot, the soldier cannot be taken by the General
+        defended = dict(soldier)
+        defended[(9, 4)] = CHARIOT + BLACK_PIECE
+        self.assertEqual(exchange_on_squares(make_squares(defended), square(1, 4)), 0)
+
+        # The General takes the chariot that took back, as nothing else guards the square
+        defended[(1, 0)] = CHARIOT
+        self.assertEqual(exchange_on_squares(make_squares(defended), square(1, 4)), 100)
+
+        # With the horse guarding the square too, the General stays back and the chariot is lost
+        defended[(3, 5)] = HORSE + BLACK_PIECE
+        self.assertEqual(exchange_on_squares(make_squares(defended), square(1, 4)), 100 - 900)
+
+    def test_first_capturer(self):
+        # The soldier takes the cannon for free, but the chariot taking it first is lost to the horse
+        game = XiangqiGame()
+        game.load_fen("3k5/9/5n3/9/R3c4/4P4/9/9/9/5K3 w - - 0 1")
+        self.assertEqual(static_exchange(game, square(5, 4)), 450)
+        self.assertEqual(static_exchange(game, square(5, 4), square(4, 4)), 450)
+        self.assertEqual(static_exchange(game, square(5, 4), square(5, 0)), 450 - 900 + 400)
+
+    def test_random_positions(self):
+        rng = random.Random(SEED)
+        for num in range(GAMES):
+            game = XiangqiGame()
+            for step in random_walk(game, rng, MAX_PLIES):
+                squares = game.get_squares()
+                for sq in range(90):
+                    if squares[sq] != NO_PIECE:
+                        color = 1 - (squares[sq] >> 3)
+                        self.assertEqual(exchange_on_squares(squares, sq), full_exchange(squares, sq, color),
+                                         "exchange on %d in %s" % (sq, game.get_fen()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# Description: Tests of the position index in gamedb.py: a database built from random games from a fixed seed must
+#  find every position, with its results and continuations, exactly as a scan of the games does.
+
+import os
+import random
+import tempfile
+import unittest
+import gamedb
+from xiangqi import XiangqiGame
+from move import MOVE_MASK, str_to_move
+from random_games import random_walk
+
+SEED = 13
+GAMES = 24
+PLIES = 40
+SHARED_PLIES = 4  # Opening plies picked from the first few legal moves, so games reach the same positions
+RESULTS = (gamedb.RED_WIN, gamedb.DRAW, gamedb.BLACK_WIN, gamedb.UNKNOWN_RESULT)
+
+
+def random_games(rng):
+    """Returns random games as a list of tuples of a list of packed moves and a result."""
+    games = []
+    for num in range(GAMES):
+        game = XiangqiGame()
+        for ply in range(SHARED_PLIES):
+            game.push_move(rng.choice(game.legal_move_list()[:3]))
+        for step in random_walk(game, rng, PLIES - SHARED_PLIES):
+            pass
+        games.append((game.get_history().get_moves(), rng.choice(RESULTS)))
+    return games
+
+
+class GameDatabaseTest(unittest.TestCase):
+    """Compares database lookups with a scan of the games."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.games = random_games(random.Random(SEED))
+        gamedb.build_database(cls.directory.name, cls.games)
+        cls.database = gamedb.load_database(cls.directory.name)
+
+        # Every time each position was reached, in order of game and ply
+        cls.reached = {}
+        for game_id, (moves, result) in enumerate(cls.games):
+            game = XiangqiGame()
+            cls.reached.setdefault(gamedb.game_hash(game), []).append((game_id, 0))
+            for ply, move in enumerate(moves):
+                game.push_move(move)
+                cls.reached.setdefault(gamedb.game_hash(game), []).append((game_id, ply + 1))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database = None
+        cls.directory.cleanup()
+
+    def test_games(self):
+        self.assertEqual(self.database.get_game_count(), GAMES)
+        for game_id, (moves, result) in enumerate(self.games):
+            self.assertEqual(self.database.get_game(game_id), ([move & MOVE_MASK for move in moves], result))
+
+    def test_find(self):
+        for key, entries in self.reached.items():
+            found = [(int(game_id), int(ply)) for game_id, ply in self.database.find(key)]
+            self.assertEqual(found, entries)
+        self.assertEqual(len(self.database.find(12345)), 0)
+
+    def test_results_and_continuations(self):
+        for key, entries in self.reached.items():
+            game_ids = sorted(set(game_id for game_id, ply in entries))
+            results = [self.games[game_id][1] for game_id in game_ids]
+            self.assertEqual(self.database.results(key), (results.count(gamedb.RED_WIN), results.count(gamedb.DRAW),
+                                                          results.count(gamedb.BLACK_WIN)))
+
+            stats = {}
+            for game_id, ply in entries:
+                moves, result = self.games[game_id]
+                if ply == len(moves):
+                    continue
+                stat = stats.setdefault(moves[ply] & MOVE_MASK, [0, 0, 0, 0])
+                stat[0] += 1
+                if result in (gamedb.RED_WIN, gamedb.DRAW, gamedb.BLACK_WIN):
+                    stat[1 + (gamedb.RED_WIN, gamedb.DRAW, gamedb.BLACK_WIN).index(result)] += 1
+            continuations = self.database.continuations(key)
+            found = {move: [count, red_wins, draws, black_wins]
+                     for move, count, red_wins, draws, black_wins in continuations}
+            self.assertEqual(found, stats)
+            counts = [count for move, count, red_wins, draws, black_wins in continuations]
+            self.assertEqual(counts, sorted(counts, reverse=True), "most played first")
+
+
+class ReadGamesTest(unittest.TestCase):
+    """Reads a games file with lines that are not games."""
+
+    def test_read_games(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "games.txt")
+        with open(path, "w") as games_file:
+            games_file.write("# A comment\n\n1-0 h2e2 h9g7\nh2e2 h9g7\n0-1 b0c2 x9 b9c7\n* \n")
+        self.assertEqual(list(gamedb.read_games(path)), [
+            ([str_to_move("h2e2"), str_to_move("h9g7")], gamedb.RED_WIN),
+            ([str_to_move("b0c2")], gamedb.BLACK_WIN),
+            ([], gamedb.UNKNOWN_RESULT)])
+
+
+if __name__ == "__main__":
+    unittest.main()
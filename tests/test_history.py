@@ -0,0 +1,129 @@
+# Description: Tests of the packed move history in move.py and of undo, redo and goto_ply in XiangqiGame, through
+#  random games from a fixed seed.
+
+import contextlib
+import io
+import random
+import unittest
+from xiangqi import XiangqiGame
+from move import MoveHistory, NO_PIECE, CHARIOT, SOLDIER, encode_move, move_captured, str_to_move
+from random_games import random_walk
+
+SEED = 17
+GAMES = 4
+MAX_PLIES = 80
+UNDO_CHANCE = 0.2
+
+
+class MoveHistoryTest(unittest.TestCase):
+    """Checks MoveHistory on its own."""
+
+    def test_captures_kept_apart_from_moves(self):
+        history = MoveHistory()
+        moves = [encode_move(0, 9), encode_move(9, 18, SOLDIER), encode_move(80, 8, CHARIOT)]
+        for move in moves:
+            history.record(move)
+        self.assertEqual(history.get_moves(), moves)
+        self.assertEqual(history.get_moves(1, 3), moves[1:])
+        self.assertEqual([move_captured(move) for move in history.get_moves()], [NO_PIECE, SOLDIER, CHARIOT])
+        self.assertEqual(history._moves.itemsize, 2)
+        self.assertEqual(history._captures.itemsize, 1)
+
+    def test_step_back_and_redo(self):
+        history = MoveHistory()
+        moves = [encode_move(0, 9), encode_move(9, 18, SOLDIER)]
+        for move in moves:
+            history.record(move)
+        self.assertEqual(history.step_back(), moves[1])
+        self.assertEqual(history.get_ply(), 1)
+        self.assertEqual(history.next_move(), moves[1])
+        self.assertEqual(history.step_back(), moves[0])
+        self.assertIsNone(history.step_back())
+
+        # Replaying the undone move keeps the line after it, any other move discards it
+        history.record(moves[0])
+        self.assertEqual(len(history), 2)
+        history.record(encode_move(9, 10))
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history.get_moves(), [moves[0], encode_move(9, 10)])
+        self.assertIsNone(history.next_move())
+
+
+class GameHistoryTest(unittest.TestCase):
+    """Checks undo, redo and goto_ply against the positions a game went through."""
+
+    def setUp(self):
+        # Undo and redo print the moves they take back and make
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def test_round_trips(self):
+        rng = random.Random(SEED)
+        for num in range(GAMES):
+            game = XiangqiGame()
+            for step in random_walk(game, rng, MAX_PLIES, UNDO_CHANCE):
+                pass
+            ply = game.get_history().get_ply()
+            undone = len(game.get_history()) - ply  # Moves taken back at the end of the walk, still there to redo
+            fens = []
+            hashes = []
+            for back in range(ply + 1):
+                fens.append(game.get_fen())
+                hashes.append(game.get_hash())
+                game.undo_move()
+            fens.reverse()
+            hashes.reverse()
+            self.assertFalse(game.undo_move())
+            self.assertEqual(game.get_history().get_ply(), 0)
+
+            for forward in range(1, ply + 1):
+                self.assertTrue(game.redo_move())
+                self.assertEqual(game.get_fen(), fens[forward], "redo %d of game %d" % (forward, num))
+                self.assertEqual(game.get_hash(), hashes[forward])
+            for forward in range(undone):
+                self.assertTrue(game.redo_move())
+            self.assertFalse(game.redo_move())
+            for back in range(undone):
+                game.undo_move()
+
+            for target in (0, ply // 2, ply, 1):
+                self.assertTrue(game.goto_ply(target))
+                self.assertEqual(game.get_fen(), fens[target], "goto_ply(%d) of game %d" % (target, num))
+
+    def test_new_move_discards_redo_line(self):
+        game = XiangqiGame()
+        for text in ("h2e2", "h9g7", "e2e6"):  # The cannon takes the centre soldier
+            game.push_move(str_to_move(text))
+        self.assertEqual(move_captured(game.get_history().get_moves()[2]), SOLDIER)
+        game.undo_move()
+        game.undo_move()
+        self.assertEqual(len(game.get_history()), 3)
+        game.push_move(str_to_move("b9c7"))
+        self.assertEqual(len(game.get_history()), 2)
+        self.assertFalse(game.redo_move())
+
+        # Undoing the capture puts the soldier back
+        game.goto_ply(0)
+        for text in ("h2e2", "h9g7", "e2e6"):
+            game.push_move(str_to_move(text))
+        game.undo_move()
+        self.assertEqual(game.get_board()[6][4].get_name(), "SOLDIER")
+        self.assertTrue(game.redo_move())
+        self.assertEqual(game.get_board()[6][4].get_name(), "CANNON")
+
+    def test_positions_not_shared(self):
+        # Pieces get positions of their own, so changing one never changes another piece or a later move
+        game = XiangqiGame()
+        game.push_move(str_to_move("h2e2"))
+        game.undo_move()
+        game.push_move(str_to_move("h2e2"))
+        cannon = game.get_board()[2][4]
+        self.assertEqual(cannon.get_position(), [2, 4])
+        cannon.get_position()[1] = 4
+        game.undo_move()
+        self.assertEqual(game.get_board()[2][7].get_position(), [2, 7])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+# Description: Tests of the df-pn mate solver in mate.py against a brute force search of every line, on random
+#  endgame positions from a fixed seed.
+
+import contextlib
+import io
+import random
+import unittest
+from xiangqi import XiangqiGame
+from mate import MateSolver
+
+SEED = 11
+POSITIONS = 10  # Random positions solved in each test
+MOVES = 2  # Mate in this many moves is looked for
+
+
+def gives_check(game):
+    """Returns True if the side to move in a game is in check."""
+    return game.general_exposed_test(game.get_current_player(), game.get_opponent_player())
+
+
+def brute_force_mate(game, plies, attacker=True, checks_only=False):
+    """Returns True if the attacker can force mate within a number of plies, trying every line."""
+    moves = game.legal_move_list()
+    if attacker and checks_only:
+        checks = []
+        for move in moves:
+            game.push_move(move)
+            if gives_check(game):
+                checks.append(move)
+            game.undo_move()
+        moves = checks
+    if not moves:
+        return not attacker
+    if plies == 0:
+        return False
+    for move in moves:
+        game.push_move(move)
+        mate = brute_force_mate(game, plies - 1, not attacker, checks_only)
+        game.undo_move()
+        if attacker and mate:
+            return True
+        if not attacker and not mate:
+            return False
+    return not attacker
+
+
+def random_endgame(rng):
+    """Returns a XiangqiGame set up at a random endgame with red to move and black not in check."""
+    while True:
+        board = [["."] * 9 for row in range(10)]
+
+        def put(letter, rows, cols):
+            while True:
+                row = rng.choice(rows)
+                col = rng.choice(cols)
+                if board[row][col] == ".":
+                    board[row][col] = letter
+                    return
+
+        put("K", [0, 1, 2], [3, 4, 5])
+        put("k", [7, 8, 9], [3, 4, 5])
+        for letter in rng.sample("RRNCCP", 3):
+            put(letter, range(10), range(9))
+        for letter in rng.sample("aabp", 2):
+            if letter == "a":
+                put(letter, [7, 8, 9], [3, 4, 5])
+            else:
+                put(letter, range(5, 10), range(9))
+
+        ranks = []
+        for row in range(9, -1, -1):
+            rank = ""
+            empty = 0
+            for letter in board[row]:
+                if letter == ".":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        game = XiangqiGame()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded = game.load_fen("/".join(ranks) + " w - - 0 1")
+        if not loaded or game.get_game_state() != "UNFINISHED":
+            continue
+        if game.general_exposed_test(game.get_opponent_player(), game.get_current_player()):
+            continue
+        return game
+
+
+class MateSolverTest(unittest.TestCase):
+    """Compares MateSolver with a brute force search."""
+
+    def check_positions(self, checks_only, table_size=None):
+        """
+        Solves random positions and checks the result and the mating line against brute force.
+        :return: tuple of the number of mates found and the number of times the table was collected
+        """
+        rng = random.Random(SEED)
+        found = 0
+        collections = 0
+        for num in range(POSITIONS):
+            game = random_endgame(rng)
+            fen = game.get_fen()
+            if table_size is None:
+                solver = MateSolver(checks_only=checks_only)
+            else:
+                solver = MateSolver(table_size, checks_only=checks_only)
+            result, line = solver.solve(game, MOVES)
+            collections += solver.get_collections()
+            self.assertEqual(game.get_fen(), fen, "solve() must leave the game where it started")
+            self.assertEqual(result, brute_force_mate(game, 2 * MOVES - 1, True, checks_only), fen)
+            if result:
+                found += 1
+                self.assertLessEqual(len(line), 2 * MOVES - 1)
+                for move in line:
+                    game.push_move(move)
+                self.assertEqual(game.legal_move_list(), [], "the mating line must end in mate: " + fen)
+        return found, collections
+
+    def test_all_moves(self):
+        found, collections = self.check_positions(False)
+        self.assertGreater(found, 0)
+
+    def test_checks_only(self):
+        self.check_positions(True)
+
+    def test_small_table(self):
+        # A table this small is collected during the solves, which must not change the answers
+        found, collections = self.check_positions(False, table_size=256)
+        self.assertGreater(collections, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
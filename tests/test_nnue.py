@@ -0,0 +1,64 @@
+# Description: Tests that the accumulators NnueEvaluator in nnue.py updates move by move give the same scores as the
+#  network evaluated from scratch and in batches, through random games with undos from a fixed seed.
+
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+import numpy as np
+import nnue
+from xiangqi import XiangqiGame
+from random_games import random_walk
+
+SEED = 3
+GAMES = 3
+MAX_PLIES = 100
+UNDO_CHANCE = 0.2
+TOLERANCE = 1  # Scores are rounded to whole units, so float32 sums in a different order may differ by one
+
+
+class NnueEvaluatorTest(unittest.TestCase):
+    """Compares incremental NNUE evaluation with evaluation from scratch."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, "weights.npy")
+        nnue.init_weights(path, seed=SEED)
+        cls.network = nnue.load_network(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.network = None
+        cls.directory.cleanup()
+
+    def assert_matches_scratch(self, evaluator, message):
+        score = evaluator.evaluate()
+        side = evaluator.get_side()
+        self.assertLessEqual(abs(score - self.network.evaluate_squares(evaluator.get_squares(), side)), TOLERANCE,
+                             message)
+        batched = self.network.evaluate_batch(np.array([evaluator.get_accumulators()]), [side])[0]
+        self.assertLessEqual(abs(score - batched), TOLERANCE, message)
+
+    def test_moves_and_undos(self):
+        rng = random.Random(SEED)
+        for num in range(GAMES):
+            game = XiangqiGame()
+            evaluator = nnue.NnueEvaluator(game, self.network)
+            for step in random_walk(game, rng, MAX_PLIES, UNDO_CHANCE):
+                self.assertEqual(evaluator.get_squares(), game.get_squares())
+                self.assert_matches_scratch(evaluator, "step %d of game %d" % (step + 1, num))
+
+            # An evaluator made mid-game must follow undos past the position it started from
+            late = nnue.NnueEvaluator(game, self.network)
+            for ply in range(min(10, game.get_history().get_ply())):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    game.undo_move()
+                self.assertEqual(late.get_squares(), game.get_squares())
+                self.assert_matches_scratch(late, "undo %d of game %d" % (ply + 1, num))
+
+
+if __name__ == "__main__":
+    unittest.main()
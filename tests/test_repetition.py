@@ -0,0 +1,96 @@
+# Description: Tests of the Zobrist hash history and repetition rules of XiangqiGame: the hash kept up to date move
+#  by move against hashing the board from scratch, the bounded and the full hash history against each other, and
+#  the results of perpetual check, perpetual chase and idle repetitions.
+
+import contextlib
+import io
+import random
+import unittest
+from xiangqi import XiangqiGame
+from move import NO_PIECE, MOVE_MASK, move_captured, str_to_move
+from zobrist import hash_squares
+from random_games import random_walk
+
+SEED = 7
+GAMES = 4
+MAX_PLIES = 120
+UNDO_CHANCE = 0.3
+
+
+def scratch_hash(game):
+    """Returns the hash of a game's current position worked out from its board."""
+    return hash_squares(game.get_squares(), 0 if game.get_current_player().get_player_color() == "red" else 1)
+
+
+def play(fen, moves):
+    """Plays moves in coordinate notation from a FEN and returns the game, or None if a move was rejected."""
+    game = XiangqiGame()
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.load_fen(fen)
+        for text in moves:
+            if not game.play_move(str_to_move(text)):
+                return None
+    return game
+
+
+class HashHistoryTest(unittest.TestCase):
+    """Compares the incremental hashes and the two kinds of hash history."""
+
+    def test_bounded_and_full_history(self):
+        rng = random.Random(SEED)
+        for num in range(GAMES):
+            full = XiangqiGame()
+            bounded = XiangqiGame()
+            bounded.set_bounded_history(True)
+            for step in random_walk(full, rng, MAX_PLIES, UNDO_CHANCE):
+                # Take the same step in the game with the bounded history
+                history = full.get_history()
+                if history.get_ply() < bounded.get_history().get_ply():
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        bounded.undo_move()
+                else:
+                    bounded.push_move(history.get_moves(history.get_ply() - 1, history.get_ply())[0] & MOVE_MASK)
+
+                message = "step %d of game %d" % (step + 1, num)
+                self.assertEqual(full.get_hash(), scratch_hash(full), message)
+                self.assertEqual(bounded.get_hash(), full.get_hash(), message)
+                self.assertEqual(bounded.get_repetition_count(), full.get_repetition_count(), message)
+
+                # The bounded history holds the hashes since the last capture, which end the full history
+                played = history.get_moves(0, history.get_ply())
+                since = max([index + 1 for index, move in enumerate(played) if move_captured(move) != NO_PIECE] +
+                            [0])
+                self.assertEqual(list(bounded._hash_history), list(full._hash_history)[since:], message)
+
+
+class RepetitionRulesTest(unittest.TestCase):
+    """Checks the game state given by the repetition rules."""
+
+    def test_idle_draw(self):
+        game = play("4k4/9/2c6/R8/9/9/9/9/9/3K5 w - - 0 1", ["a6a4", "c7c6", "a4a6", "c6c7"] * 2)
+        self.assertEqual(game.get_game_state(), "DRAW_REPETITION")
+
+    def test_perpetual_check(self):
+        game = play("3k5/9/9/9/9/9/9/9/4A4/R3K4 w - - 0 1", ["a0a9"] + ["d9d8", "a9a8", "d8d9", "a8a9"] * 2)
+        self.assertEqual(game.get_game_state(), "BLACK_WON_PERPETUAL_CHECK")
+
+    def test_perpetual_chase(self):
+        game = play("4k4/9/2c6/R8/9/9/9/9/9/3K5 w - - 0 1", ["a6a7"] + ["c7c5", "a7a5", "c5c7", "a5a7"] * 2)
+        self.assertEqual(game.get_game_state(), "BLACK_WON_PERPETUAL_CHASE")
+
+    def test_undo_after_repetition(self):
+        # Ending the game by repetition must not leave the positions of the cycle without legal moves
+        game = play("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1",
+                    ["b0c2", "b9c7", "c2b0", "c7b9"] * 2)
+        self.assertEqual(game.get_game_state(), "DRAW_REPETITION")
+        self.assertEqual(game.legal_move_list(), [])
+        with contextlib.redirect_stdout(io.StringIO()):
+            game.goto_ply(0)
+            self.assertEqual(game.get_game_state(), "UNFINISHED")
+            self.assertEqual(len(game.legal_move_list()), 44)
+            game.goto_ply(4)
+            self.assertEqual(game.get_repetition_count(), 2)
+            self.assertEqual(len(game.legal_move_list()), 44)
+
+if __name__ == "__main__":
+    unittest.main()
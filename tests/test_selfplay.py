@@ -0,0 +1,108 @@
+# Description: Tests of the self-play dataset: shards filled across games, the last shard cut to size, datasets
+#  added to, and run_selfplay with worker processes, including one that dies.
+
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+import numpy as np
+import selfplay
+from selfplay import POSITION_DTYPE, DatasetWriter, load_dataset, run_selfplay
+
+SHARD_SIZE = 10
+
+
+def make_game(first, size):
+    """Returns a game of positions numbered from first, the number stored in a corner of the first plane."""
+    data = np.zeros(size, dtype=POSITION_DTYPE)
+    data["planes"][:, 0, 0, 0] = np.arange(first, first + size)
+    data["side"] = np.arange(size) % 2
+    data["result"] = 1
+    return data
+
+
+def numbers(shards):
+    """Returns the numbers of the positions in a list of shards, in order."""
+    return [int(value) for shard in shards for value in shard["planes"][:, 0, 0, 0]]
+
+
+def die(*args):
+    """Stands in for play_game to make a worker process exit as if it had crashed."""
+    os._exit(9)
+
+
+class DatasetWriterTest(unittest.TestCase):
+    """Writes small games to shards of SHARD_SIZE positions."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_shards(self):
+        writer = DatasetWriter(self.directory, SHARD_SIZE)
+        for first in (0, 7, 14):
+            writer.add_game(make_game(first, 7))
+        self.assertEqual(writer.get_positions(), 21)
+        writer.close()
+
+        # Games run on into the next shard, and the last one holds only the positions written to it
+        shards = load_dataset(self.directory)
+        self.assertEqual([len(shard) for shard in shards], [10, 10, 1])
+        self.assertEqual(numbers(shards), list(range(21)))
+        last = np.load(os.path.join(self.directory, "shard_00002.npy"), mmap_mode="r")
+        self.assertEqual(len(last), 1)
+
+    def test_append(self):
+        writer = DatasetWriter(self.directory, SHARD_SIZE)
+        writer.add_game(make_game(0, 12))
+        writer.close()
+
+        writer = DatasetWriter(self.directory, SHARD_SIZE)
+        self.assertEqual(writer.get_positions(), 12)
+        writer.add_game(make_game(12, 5))
+        writer.close()
+        shards = load_dataset(self.directory)
+        self.assertEqual([len(shard) for shard in shards], [10, 2, 5])
+        self.assertEqual(numbers(shards), list(range(17)))
+        self.assertEqual(DatasetWriter(self.directory, SHARD_SIZE).get_positions(), 17)
+
+    def test_empty(self):
+        self.assertEqual(load_dataset(self.directory), [])
+        DatasetWriter(self.directory, SHARD_SIZE).close()
+        self.assertEqual(load_dataset(self.directory), [])
+
+
+class RunSelfplayTest(unittest.TestCase):
+    """Plays short games on worker processes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_games_written(self):
+        # More games than fit on the task queue at once
+        games = 2 * selfplay.TASKS_PER_WORKER + 1
+        written, rate = run_selfplay(self.directory, games, workers=1, random_plies=4, max_plies=12,
+                                     shard_size=SHARD_SIZE, report=None)
+        shards = load_dataset(self.directory)
+        self.assertEqual(sum(len(shard) for shard in shards), written)
+        self.assertGreater(written, 0)
+        with open(os.path.join(self.directory, selfplay.INDEX_FILE)) as index_file:
+            self.assertEqual(json.load(index_file)["games"], games)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "needs workers forked from this process")
+    def test_dead_worker(self):
+        play_game = selfplay.play_game
+        selfplay.play_game = die  # The workers are forked, so they see the stand-in too
+        try:
+            with self.assertRaises(RuntimeError):
+                run_selfplay(self.directory, 3, workers=1, shard_size=SHARD_SIZE, report=None)
+        finally:
+            selfplay.play_game = play_game
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# Description: Tests of the UCCI adapter, fed commands one line at a time with its answers written to a string.
+
+import io
+import unittest
+from ucci import UcciAdapter
+from xiangqi import XiangqiGame, START_FEN
+from move import str_to_move, MOVE_MASK
+
+TIMEOUT = 30.0  # Seconds a search may take before the test fails
+
+
+class UcciAdapterTest(unittest.TestCase):
+    """Checks the answers to the commands and the limits of the searches they start."""
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.adapter = UcciAdapter(self.output)
+        self.addCleanup(self.adapter.handle, "quit")
+
+    def lines(self):
+        """Returns the lines written by the adapter so far."""
+        return self.output.getvalue().splitlines()
+
+    def wait_for_search(self):
+        """Waits for the search in progress to end on its own and returns the move it reported."""
+        thread = self.adapter._thread
+        thread.join(TIMEOUT)
+        self.assertFalse(thread.is_alive(), "the search did not end by itself")
+        self.assertTrue(self.lines()[-1].startswith("bestmove "))
+        return str_to_move(self.lines()[-1].split()[1])
+
+    def legal_moves(self, fen, moves):
+        """Returns the legal moves after a list of moves from a position, without capture information."""
+        game = XiangqiGame()
+        game.load_fen(fen)
+        for text in moves:
+            game.push_move(str_to_move(text))
+        return game.legal_move_list()
+
+    def test_handshake(self):
+        self.assertTrue(self.adapter.handle("ucci"))
+        self.assertTrue(self.adapter.handle("isready"))
+        self.assertEqual(self.lines()[-2:], ["ucciok", "readyok"])
+        self.assertFalse(self.adapter.handle("quit"))
+        self.assertEqual(self.lines()[-1], "bye")
+
+    def test_position_and_go(self):
+        self.adapter.handle("position startpos moves h2e2 h9g7")
+        self.adapter.handle("go depth 2")
+        move = self.wait_for_search()
+        self.assertIn(move & MOVE_MASK, self.legal_moves(START_FEN, ["h2e2", "h9g7"]))
+
+    def test_bare_go_has_a_limit(self):
+        self.adapter.handle("position startpos")
+        self.adapter.handle("go")
+        move = self.wait_for_search()
+        self.assertIn(move & MOVE_MASK, self.legal_moves(START_FEN, []))
+
+    def test_illegal_move_rejects_position(self):
+        self.adapter.handle("position startpos moves h2e2")
+        fen = self.adapter._game.get_fen()
+        for command in ("position startpos moves h9g7 h2e2", "position startpos moves zz",
+                        "position fen 9/9/9 w - - 0 1 moves h2e2"):
+            self.adapter.handle(command)
+            self.assertTrue(self.lines()[-1].startswith("info string "), command)
+            self.assertEqual(self.adapter._game.get_fen(), fen, command)
+
+    def test_ponderhit_sets_time_limit(self):
+        # Sent straight after go, the ponderhit may come before the search has started
+        self.adapter.handle("setoption usemillisec true")
+        self.adapter.handle("position startpos")
+        self.adapter.handle("go ponder time 3000")
+        self.adapter.handle("ponderhit")
+        move = self.wait_for_search()
+        self.assertIn(move & MOVE_MASK, self.legal_moves(START_FEN, []))
+
+    def test_stop_ends_infinite_search(self):
+        self.adapter.handle("position startpos")
+        self.adapter.handle("go infinite")
+        self.assertTrue(self.adapter._thread.is_alive())
+        self.adapter.handle("stop")
+        self.wait_for_search()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+# Description: Tests that XiangqiGame ends the game exactly when the side to move has no legal moves, through random
+#  games from a fixed seed played with play_move(), which updates check statuses and the game state.
+
+import random
+import unittest
+from xiangqi import XiangqiGame
+from random_games import random_walk
+
+SEED = 0
+GAMES = 40
+MAX_PLIES = 200
+
+
+class GameEndTest(unittest.TestCase):
+    """Checks the game state after each move against the legal moves of the position."""
+
+    def test_random_games(self):
+        rng = random.Random(SEED)
+        finished = 0
+        for num in range(GAMES):
+            game = XiangqiGame()
+            for step in random_walk(game, rng, MAX_PLIES, play=True):
+                if game.get_game_state() == "UNFINISHED":
+                    self.assertNotEqual(game.legal_move_list(), [], "unfinished game without legal moves: " +
+                                        game.get_fen())
+
+            state = game.get_game_state()
+            if state in ("RED_WON", "BLACK_WON"):
+                finished += 1
+                # The same position set up from scratch must have no legal moves either
+                fresh = XiangqiGame()
+                fresh.load_fen(game.get_fen())
+                self.assertEqual(fresh.legal_move_list(), [], "game ended with legal moves: " + game.get_fen())
+                self.assertEqual(fresh.get_game_state(), state)
+        self.assertGreater(finished, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+# Description: UCCI (Universal Chinese Chess Interface) front end for the XiangQi game, so the engine can be run
+#  by Xiangqi GUIs and tournament managers. Commands are read from stdin and answers written to stdout. Searches
+#  run on a worker thread, so commands such as stop and ponderhit are handled while a search is in progress.
+#  Run with: python ucci.py
+
+import sys
+import threading
+import time
+from xiangqi import XiangqiGame, START_FEN
+from engine import Searcher, DEFAULT_DEPTH
+from move import move_to_str, str_to_move, MOVE_MASK
+
+ENGINE_NAME = "XiangQi"
+ENGINE_AUTHOR = "Kevin Chang"
+MAX_DEPTH = 64  # Depth searched by go infinite and go ponder, which run until stopped or given a time limit
+DEFAULT_MOVESTOGO = 30  # Moves the remaining time is shared between when go time has no movestogo
+
+
+class UcciAdapter:
+    """Carries out UCCI commands on a XiangqiGame and a Searcher."""
+
+    def __init__(self, output=None):
+        """Creates the adapter. Answers are written to output, which defaults to stdout."""
+        if output is None:
+            output = sys.stdout
+        self._output = output
+        self._output_lock = threading.Lock()  # Lines are written from both the command and search threads
+        self._stop_event = threading.Event()
+        self._searcher = Searcher(self._stop_event)
+        self._game = XiangqiGame()
+        self._thread = None  # Thread of the search in progress
+        self._release = threading.Event()  # Set once a ponder or infinite search may report its best move
+        self._ponder_movetime = None  # Seconds to search for after a ponderhit
+        self._timer = None  # Timer stopping the search at the end of the time given by a ponderhit
+        self._millisec = False  # Times are in seconds unless the usemillisec option is set
+
+    def send(self, line):
+        """Writes one line of output."""
+        with self._output_lock:
+            self._output.write(line + "\n")
+            self._output.flush()
+
+    def run(self, source=None):
+        """Reads and carries out commands from source (stdin by default) until quit or the end of the input."""
+        if source is None:
+            source = sys.stdin
+        for line in source:
+            if self.handle(line) is False:
+                return
+        self._finish_search()
+
+    def handle(self, line):
+        """
+        Carries out one command.
+        :param line: the command line
+        :return: False after the quit command. Else True
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        args = tokens[1:]
+
+        if command == "ucci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author " + ENGINE_AUTHOR)
+            self.send("option usemillisec type check default false")
+            self.send("ucciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            if len(args) >= 2 and args[0] == "usemillisec":
+                self._millisec = args[1] == "true"
+        elif command == "position":
+            self._finish_search()
+            self._position(args)
+        elif command == "go":
+            self._finish_search()
+            self._go(args)
+        elif command == "ponderhit":
+            # The time limit is kept by setting the stop event, which the search only reads, so it holds however
+            # soon after the go command this arrives
+            if self._ponder_movetime is not None and self._thread is not None and self._timer is None:
+                self._timer = threading.Timer(self._ponder_movetime, self._stop_event.set)
+                self._timer.daemon = True
+                self._timer.start()
+            self._release.set()
+        elif command == "stop":
+            self._stop_event.set()
+            self._release.set()
+        elif command == "quit":
+            self._finish_search()
+            self.send("bye")
+            return False
+        return True
+
+    def _finish_search(self):
+        """Stops the search in progress, if any, and waits for it to report its best move."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer.join()
+            self._timer = None
+        if self._thread is not None:
+            self._stop_event.set()
+            self._release.set()
+            self._thread.join()
+            self._thread = None
+
+    def _position(self, args):
+        """
+        Sets up the position of a 'position {fen <fen> | startpos} [moves <move> ...]' command. A command with an
+        invalid FEN or an illegal move is reported with info string and leaves the position as it was.
+        """
+        if "moves" in args:
+            moves = args[args.index("moves") + 1:]
+            args = args[:args.index("moves")]
+        else:
+            moves = []
+
+        if args and args[0] == "fen":
+            fen = " ".join(args[1:])
+        else:
+            fen = START_FEN
+        game = XiangqiGame()
+        if game.load_fen(fen) is False:
+            self.send("info string invalid fen " + fen)
+            return
+
+        for text in moves:
+            move = str_to_move(text)
+            if move is None or move & MOVE_MASK not in set(game.legal_move_list()):
+                self.send("info string illegal move " + text)
+                return
+            game.push_move(move)
+        self._game = game
+
+    def _go(self, args):
+        """
+        Starts the search of a 'go [ponder | draw] [depth <d> | nodes <n> | time <t> ... | infinite]' command. A go
+        with none of these limits searches DEFAULT_DEPTH plies.
+        """
+        depth = MAX_DEPTH
+        nodes = None
+        movetime = None
+        ponder = "ponder" in args
+        infinite = "infinite" in args
+        options = {}
+        for num in range(len(args) - 1):
+            if args[num] in ("depth", "nodes", "time", "movestogo", "increment"):
+                try:
+                    options[args[num]] = int(args[num + 1])
+                except ValueError:
+                    pass
+
+        if "depth" in options:
+            depth = options["depth"]
+        if "nodes" in options:
+            nodes = options["nodes"]
+        if "time" in options:
+            scale = 1000.0 if self._millisec else 1.0
+            remaining = options["time"] / scale
+            increment = options.get("increment", 0) / scale
+            movestogo = max(options.get("movestogo", DEFAULT_MOVESTOGO), 1)
+            movetime = min(remaining / movestogo + increment, remaining / 2)
+        if not (ponder or infinite or options.keys() & {"depth", "nodes", "time"}):
+            depth = DEFAULT_DEPTH
+
+        # A ponder search runs without a time limit until ponderhit gives it one, or until stop
+        self._ponder_movetime = movetime if ponder else None
+        if ponder:
+            movetime = None
+        if ponder or infinite:
+            self._release.clear()
+        else:
+            self._release.set()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._search, args=(depth, movetime, nodes), daemon=True)
+        self._thread.start()
+
+    def _search(self, depth, movetime, nodes):
+        """Search thread: searches the current position and reports the best move."""
+        start = time.time()
+
+        def info(depth_done, score, nodes_done, pv):
+            self.send("info depth %d score %d nodes %d time %d pv %s" % (
+                depth_done, score, nodes_done, (time.time() - start) * 1000, " ".join(move_to_str(m) for m in pv)))
+
+        move, score = self._searcher.search(self._game, depth, movetime, info, nodes)
+        pv = self._searcher.principal_variation(self._game, 2)
+
+        self._release.wait()  # Ponder and infinite searches report only after ponderhit or stop
+        if move is None:
+            self.send("nobestmove")
+        elif len(pv) == 2 and pv[0] == move:
+            self.send("bestmove " + move_to_str(move) + " ponder " + move_to_str(pv[1]))
+        else:
+            self.send("bestmove " + move_to_str(move))
+
+
+if __name__ == "__main__":
+    UcciAdapter().run()
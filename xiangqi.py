@@ -0,0 +1,885 @@
+# Author: Kevin Chang
+# Description: Creates a game call XiangQi. The game is played on a 9x10 board, with 7 different types of pieces
+#  that have their own individual behaviors and rulesets. The goal of the game is to capture the enemy's general piece.
+#  The game is over when a player's general piece has no spaces to move without being in check.
+
+from array import array
+from player import Player
+from piece import General, Advisor, Elephant, Horse, Chariot, Cannon, Soldier
+from move import MoveHistory, PIECE_KINDS, NO_PIECE, SQUARE_POSITIONS, piece_code, square, encode_move, move_from, \
+    move_to, move_captured
+from zobrist import hash_squares, update_hash
+from rules import REPETITION_LIMIT, classify_cycle, repetition_result
+
+START_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1"
+
+# Piece class and board name of each FEN letter. Red pieces are upper case, black pieces lower case.
+FEN_PIECES = {"k": (General, "GENERAL"), "a": (Advisor, "ADVISOR"), "b": (Elephant, "ELEPHNT"),
+              "e": (Elephant, "ELEPHNT"), "n": (Horse, "HORSE"), "h": (Horse, "HORSE"), "r": (Chariot, "CHARIOT"),
+              "c": (Cannon, "CANNON"), "p": (Soldier, "SOLDIER")}
+FEN_LETTERS = {"GENERAL": "k", "ADVISOR": "a", "ELEPHNT": "b", "HORSE": "n", "CHARIOT": "r", "CANNON": "c",
+               "SOLDIER": "p"}
+
+LEGAL_CACHE_SIZE = 256  # Number of positions whose legal moves are kept by XiangqiGame.legal_moves()
+
+
+class XiangqiGame:
+    """Represents the entire board for the XiangQi game."""
+
+    def __init__(self):
+        """Creates an instance of the 9x10 board."""
+        self._board = [["_______" for column in range(9)] for row in range(10)]  # Initialize board
+        self._row_dimensions = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+        self._col_dimensions = (0, 1, 2, 3, 4, 5, 6, 7, 8)
+        self._game_state = "UNFINISHED"
+        self._history = MoveHistory()  # Packed moves played so far, used for undo and redo
+        self._legal_cache = {}  # Legal moves of the side to move, by position key. See legal_moves()
+        self._position_key = None  # Key of the current position, cleared whenever the board changes
+        self._listeners = []  # Objects told about every move and undo, see add_listener()
+        self._hash = 0  # Zobrist hash of the current position, updated with every move
+        self._hash_history = array("Q")  # Hash of every position since the start, or the last capture if bounded
+        self._hash_counts = {}  # Times each hash in the hash history occurs
+        self._bounded_history = False  # True to keep only the hashes since the last capture
+
+        # Initialize with red and black player. Game starts on red players turn.
+        red_player = Player("red")
+        blk_player = Player("black")
+
+        self._red_player = red_player
+        self._blk_player = blk_player
+        self._current_player = self._red_player
+        self._opp_player = self._blk_player
+
+        # Initialize starting positions of pieces
+        # Initialize General positions
+        red_gen = General("GENERAL", [0, 4], "red", red_player, self._board)
+        self._board[0][4] = red_gen
+        blk_gen = General("GENERAL", [9, 4], "black", blk_player, self._board)
+        self._board[9][4] = blk_gen
+
+        # Initialize Advisor pieces
+        red_advisor1 = Advisor("ADVISOR", [0, 3], "red", red_player, self._board)
+        self._board[0][3] = red_advisor1
+        red_advisor2 = Advisor("ADVISOR", [0, 5], "red", red_player, self._board)
+        self._board[0][5] = red_advisor2
+        blk_advisor1 = Advisor("ADVISOR", [9, 3], "black", blk_player, self._board)
+        self._board[9][3] = blk_advisor1
+        blk_advisor2 = Advisor("ADVISOR", [9, 5], "black", blk_player, self._board)
+        self._board[9][5] = blk_advisor2
+
+        # Initialize Elephant pieces
+        red_elephant1 = Elephant("ELEPHNT", [0, 2], "red", red_player, self._board)
+        self._board[0][2] = red_elephant1
+        red_elephant2 = Elephant("ELEPHNT", [0, 6], "red", red_player, self._board)
+        self._board[0][6] = red_elephant2
+        blk_elephant1 = Elephant("ELEPHNT", [9, 2], "black", blk_player, self._board)
+        self._board[9][2] = blk_elephant1
+        blk_elephant2 = Elephant("ELEPHNT", [9, 6], "black", blk_player, self._board)
+        self._board[9][6] = blk_elephant2
+
+        # Initialize Horse pieces
+        red_horse1 = Horse("HORSE", [0, 1], "red", red_player, self._board)
+        self._board[0][1] = red_horse1
+        red_horse2 = Horse("HORSE", [0, 7], "red", red_player, self._board)
+        self._board[0][7] = red_horse2
+        blk_horse1 = Horse("HORSE", [9, 1], "black", blk_player, self._board)
+        self._board[9][1] = blk_horse1
+        blk_horse2 = Horse("HORSE", [9, 7], "black", blk_player, self._board)
+        self._board[9][7] = blk_horse2
+
+        # Initialize Chariot pieces
+        red_chariot1 = Chariot("CHARIOT", [0, 0], "red", red_player, self._board)
+        self._board[0][0] = red_chariot1
+        red_chariot2 = Chariot("CHARIOT", [0, 8], "red", red_player, self._board)
+        self._board[0][8] = red_chariot2
+        blk_chariot1 = Chariot("CHARIOT", [9, 0], "black", blk_player, self._board)
+        self._board[9][0] = blk_chariot1
+        blk_chariot2 = Chariot("CHARIOT", [9, 8], "black", blk_player, self._board)
+        self._board[9][8] = blk_chariot2
+
+        # Initialize Cannon pieces
+        red_cannon1 = Cannon("CANNON", [2, 1], "red", red_player, self._board)
+        self._board[2][1] = red_cannon1
+        red_cannon2 = Cannon("CANNON", [2, 7], "red", red_player, self._board)
+        self._board[2][7] = red_cannon2
+        blk_cannon1 = Cannon("CANNON", [7, 1], "black", blk_player, self._board)
+        self._board[7][1] = blk_cannon1
+        blk_cannon2 = Cannon("CANNON", [7, 7], "black", blk_player, self._board)
+        self._board[7][7] = blk_cannon2
+
+        # Initialize Soldier pieces
+        red_soldier1 = Soldier("SOLDIER", [3, 0], "red", red_player, self._board)
+        self._board[3][0] = red_soldier1
+        red_soldier2 = Soldier("SOLDIER", [3, 2], "red", red_player, self._board)
+        self._board[3][2] = red_soldier2
+        red_soldier3 = Soldier("SOLDIER", [3, 4], "red", red_player, self._board)
+        self._board[3][4] = red_soldier3
+        red_soldier4 = Soldier("SOLDIER", [3, 6], "red", red_player, self._board)
+        self._board[3][6] = red_soldier4
+        red_soldier5 = Soldier("SOLDIER", [3, 8], "red", red_player, self._board)
+        self._board[3][8] = red_soldier5
+        blk_soldier1 = Soldier("SOLDIER", [6, 0], "black", blk_player, self._board)
+        self._board[6][0] = blk_soldier1
+        blk_soldier2 = Soldier("SOLDIER", [6, 2], "black", blk_player, self._board)
+        self._board[6][2] = blk_soldier2
+        blk_soldier3 = Soldier("SOLDIER", [6, 4], "black", blk_player, self._board)
+        self._board[6][4] = blk_soldier3
+        blk_soldier4 = Soldier("SOLDIER", [6, 6], "black", blk_player, self._board)
+        self._board[6][6] = blk_soldier4
+        blk_soldier5 = Soldier("SOLDIER", [6, 8], "black", blk_player, self._board)
+        self._board[6][8] = blk_soldier5
+
+        # Add starting pieces to respective player active pieces lists
+        red_player.set_active_pieces([red_gen,
+                                      red_advisor1, red_advisor2,
+                                      red_elephant1, red_elephant2,
+                                      red_horse1, red_horse2,
+                                      red_chariot1, red_chariot2,
+                                      red_cannon1, red_cannon2,
+                                      red_soldier1, red_soldier2, red_soldier3, red_soldier4, red_soldier5])
+        blk_player.set_active_pieces([blk_gen,
+                                      blk_advisor1, blk_advisor2,
+                                      blk_elephant1, blk_elephant2,
+                                      blk_horse1, blk_horse2,
+                                      blk_chariot1, blk_chariot2,
+                                      blk_cannon1, blk_cannon2,
+                                      blk_soldier1, blk_soldier2, blk_soldier3, blk_soldier4, blk_soldier5])
+        self._reset_hashes()
+
+        self._red_general = red_gen
+        self._blk_general = blk_gen
+
+    def load_fen(self, fen):
+        """
+        Sets up the board from a FEN string, e.g. START_FEN. The first rank listed is row 9 (black's back rank) and
+        files a-i are columns 0-8. The move history is cleared.
+        :param fen: the position in FEN notation
+        :return: True if the position was loaded. False if the FEN is not valid, leaving the game unchanged.
+        """
+        fields = fen.split()
+        if not fields or len(fields) > 6:
+            return False
+        ranks = fields[0].split("/")
+        side = fields[1] if len(fields) > 1 else "w"
+        if len(ranks) != 10 or side not in ("w", "r", "b"):
+            return False
+
+        # Read the placement into (letter, position) pairs before touching the board
+        placement = []
+        for num in range(10):
+            row = 9 - num
+            col = 0
+            for char in ranks[num]:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in FEN_PIECES and col < 9:
+                    placement.append((char, [row, col]))
+                    col += 1
+                else:
+                    return False
+            if col != 9:
+                return False
+        letters = [char for char, pos in placement]
+        if letters.count("K") != 1 or letters.count("k") != 1:
+            return False
+
+        red_player = Player("red")
+        blk_player = Player("black")
+        for row in self._row_dimensions:
+            for col in self._col_dimensions:
+                self._board[row][col] = "_______"
+
+        red_pieces = []
+        blk_pieces = []
+        for char, pos in placement:
+            piece_class, name = FEN_PIECES[char.lower()]
+            if char.isupper():
+                piece = piece_class(name, pos, "red", red_player, self._board)
+                red_pieces.append(piece)
+            else:
+                piece = piece_class(name, pos, "black", blk_player, self._board)
+                blk_pieces.append(piece)
+            piece.set_position(pos)
+            self._board[pos[0]][pos[1]] = piece
+            if char == "K":
+                self._red_general = piece
+            elif char == "k":
+                self._blk_general = piece
+
+        # The General goes first in the active pieces list, end_game_test relies on it
+        red_pieces.remove(self._red_general)
+        blk_pieces.remove(self._blk_general)
+        red_player.set_active_pieces([self._red_general] + red_pieces)
+        blk_player.set_active_pieces([self._blk_general] + blk_pieces)
+
+        self._red_player = red_player
+        self._blk_player = blk_player
+        if side == "b":
+            self._current_player = blk_player
+            self._opp_player = red_player
+        else:
+            self._current_player = red_player
+            self._opp_player = blk_player
+
+        self._history = MoveHistory()
+        self._legal_cache = {}
+        self._position_key = None
+        self._reset_hashes()
+        self._game_state = "UNFINISHED"
+        self._current_player.set_check_status(self.general_exposed_test(self._current_player, self._opp_player))
+        if not self.legal_moves():
+            self.set_game_state(self._opp_player.get_player_color())
+        for listener in self._listeners:
+            listener.position_set(self)
+        return True
+
+    def get_fen(self):
+        """Returns the current position in FEN notation."""
+        ranks = []
+        for row in range(9, -1, -1):
+            rank = ""
+            empty = 0
+            for col in self._col_dimensions:
+                piece = self._board[row][col]
+                if piece == "_______":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[piece.get_name()]
+                rank += letter.upper() if piece.get_piece_color() == "red" else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        side = "w" if self._current_player == self._red_player else "b"
+        return "/".join(ranks) + " " + side + " - - 0 " + str(self._history.get_ply() // 2 + 1)
+
+    def get_game_state(self):
+        """
+        Returns the game state: "UNFINISHED", "RED_WON" or "BLACK_WON" after a checkmate or stalemate, or after a
+        position has occurred three times "DRAW_REPETITION", or "RED_WON_PERPETUAL_CHECK",
+        "BLACK_WON_PERPETUAL_CHECK", "RED_WON_PERPETUAL_CHASE" or "BLACK_WON_PERPETUAL_CHASE" when the other side
+        lost by perpetual check or chase. See rules.py.
+        """
+        return self._game_state
+
+    def set_game_state(self, red_or_black):
+        """Sets the game state depending on color specified."""
+        if red_or_black == "red":
+            self._game_state = "RED_WON"
+        elif red_or_black == "black":
+            self._game_state = "BLACK_WON"
+
+    def is_in_check(self, red_or_black):
+        """Returns True if a player is in check, else False."""
+        if self._current_player.get_player_color() == red_or_black:
+            return self._current_player.get_check_status()
+        else:
+            return self._opp_player.get_check_status()
+
+    def add_listener(self, listener):
+        """
+        Registers an object that follows the game incrementally, such as an evaluator. After every move its
+        move_made(move) method is called with the packed move, after every undo its move_undone(move) method, and
+        after load_fen its position_set(game) method. The board is already updated when they are called.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stops telling a listener about moves."""
+        self._listeners.remove(listener)
+
+    def get_current_player(self):
+        """Returns the Player whose turn it is."""
+        return self._current_player
+
+    def get_opponent_player(self):
+        """Returns the Player who is waiting for their turn."""
+        return self._opp_player
+
+    def get_history(self):
+        """Returns the MoveHistory of the game."""
+        return self._history
+
+    def get_board(self):
+        """Returns the current board."""
+        return self._board
+
+    def print_board(self):
+        """Prints out the current board instance."""
+        for row in range(10):
+            for col in range(9):
+                if row == 9 and col == 8:
+                    if self._board[row][col] != "_______":
+                        print(self._board[row][col].get_name())
+                    else:
+                        print(self._board[row][col])
+                else:
+                    if self._board[row][col] != "_______":
+                        print(self._board[row][col].get_name(), end=" ")
+                    else:
+                        print(self._board[row][col], end=" ")
+            if row != 9:
+                print(" ")
+                print(" ")
+            if row == 4:
+                print(" ")
+                print(" ")
+
+    def change_turn(self):
+        """Changes the current player turn to the other player."""
+        if self._current_player == self._red_player:
+            self._current_player = self._blk_player
+        else:
+            self._current_player = self._red_player
+
+        if self._opp_player == self._red_player:
+            self._opp_player = self._blk_player
+        else:
+            self._opp_player = self._red_player
+
+
+    def general_sight_test(self, num=1):
+        """
+        Checks that the generals do not 'see' each other (no blocking pieces between generals), which is illegal.
+        :param num: used to keep track of spot being checked during recursion.
+        :return: True if generals 'see' each other. Else False
+        """
+        # Get red and black General Current Positions (gcp)
+        red_gcp = self._red_general.get_position()
+        blk_gcp = self._blk_general.get_position()
+
+        if red_gcp[1] == blk_gcp[1]:  # If the generals are in same column
+            spaces = blk_gcp[0] - red_gcp[0]
+
+            if num == spaces:  # Base case: if no blocking pieces, Generals see each other.
+                debug("Illegal move. Generals see each other.")
+                return True
+
+            if self._board[red_gcp[0] + num][red_gcp[1]] == "_______":
+                return self.general_sight_test(num + 1)
+        # debug("Generals do not see each other")
+        return False
+
+    def all_pieces_move_test(self, player, pos):
+        """
+        Checks to see if any of a Player's active pieces can move to a specified position.
+        :param player: the player whose pieces are being tested
+        :param pos: the specified position
+        :return: True if at least one piece can move to specified spot. False if no pieces can.
+        """
+        pieces_list = player.get_active_pieces()  # List of all active pieces of the Player
+
+        for piece in pieces_list:
+            if piece.legal_move_test(pos) == True:
+                debug(piece.get_name(), "can move there.")
+                return True
+
+        return False
+
+    def in_check_test(self, testing_player, enemy):
+        """
+        Tests if a General piece is in check.
+        :param testing_player: Player whose general is being tested for being in check or not.
+        :param enemy: The opponent of the tested player
+        :return: True if general is in check. Else False.
+        """
+        if self._red_general.get_piece_color() == testing_player.get_player_color():
+            gen = self._red_general
+        elif self._blk_general.get_piece_color() == testing_player.get_player_color():
+            gen = self._blk_general
+
+        gp = gen.get_position()  # get current player General's position
+
+        return self.all_pieces_move_test(enemy, gp)
+
+    def end_game_test(self, testing_player, enemy):
+        """
+        Tests to see if a player is in checkmate or in a stalemate
+        :param in_check_player: The player that is in check that is being tested
+        :param enemy: the opponent of the tested player
+        :return: True if player is checkmated or in stalemate and ending the game. Else False
+        """
+        # Get the correct player color and corresponding general piece and palace coordinates
+        if self._red_general.get_piece_color() == testing_player.get_player_color():
+            gen = self._red_general
+            palace = ([0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5])
+
+        elif self._blk_general.get_piece_color() == testing_player.get_player_color():
+            gen = self._blk_general
+            palace = ([7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5])
+
+        board = self._board
+        color = testing_player.get_player_color()
+        pieces_list = testing_player.get_active_pieces()
+
+        # Test each spot in the palace to see if the general can move there.
+        # If the general can move there, test to see if it would still be in check in that spot
+        # If there is a spot that is not in check, return False
+        for spot in palace:
+            if gen.legal_move_test(spot) == True and spot != gen.get_position():
+                if board[spot[0]][spot[1]] == "_______" or board[spot[0]][spot[1]].get_piece_color() != color:
+                    if self.all_pieces_move_test(enemy, spot) == False:
+                        return False
+
+        # If the in-check player has more pieces besides just the general, check all other active pieces for
+        # potential moves that can get the player out of check.
+        if len(pieces_list) > 1:
+            for num in range(1, len(pieces_list)):
+                for row in self._row_dimensions:
+                    for col in self._col_dimensions:
+                        piece = pieces_list[num]
+                        if piece.legal_move_test([row, col]) == True:
+                            if board[row][col] == "_______" or board[row][col].get_piece_color() != color:
+                                o_pos = piece.get_position()  # Original Position of the current piece
+                                holder = board[row][col]  # Holding onto the test spot's original state
+
+                                board[o_pos[0]][
+                                    o_pos[1]] = "_______"  # Temporarily move the testing piece to do a in check test
+                                board[row][col] = piece
+
+                                check_test = self.general_exposed_test(testing_player, enemy, holder)
+
+                                board[row][col] = holder  # Return the board to original state
+                                board[o_pos[0]][o_pos[1]] = piece
+
+                                if check_test == False:  # If the move places general out of check, return False
+                                    return False
+
+        debug("Checkmate!", enemy.get_player_color(), "wins.")
+        return True
+
+    def make_move(self, curr_pos, new_pos):
+        """
+        Makes a move for current player on a piece
+        :param curr_pos: the current position of piece to be moved
+        :param new_pos: the new position the piece is moving to
+        :return: True if move is legal. Else return False
+        """
+        # Check if inputted positions are inside board dimensions
+        if curr_pos[0] not in self._row_dimensions or curr_pos[1] not in self._col_dimensions:
+            debug("Selection is outside of board")
+            return False
+        if new_pos[0] not in self._row_dimensions or new_pos[1] not in self._col_dimensions:
+            debug("Move is outside of the board")
+            return False
+
+        return self._make_move(square(curr_pos[0], curr_pos[1]), square(new_pos[0], new_pos[1]))
+
+    def _make_move(self, from_sq, to_sq):
+        """
+        Makes a move for the current player given by its squares, testing that it is legal and then updating check
+        statuses and the game state. Shared by make_move() and play_move().
+        :return: True if move is legal. Else return False
+        """
+        if self._game_state != "UNFINISHED":
+            debug("Game Over", self._game_state)
+            return False
+
+        board = self._board
+        cp = SQUARE_POSITIONS[from_sq]  # current position coordinates
+        np = SQUARE_POSITIONS[to_sq]  # intended new position coordinates
+
+        # Check if there is even a piece at current position selected
+        if board[cp[0]][cp[1]] == "_______":
+            debug("There is no piece selected")
+            return False
+
+        if from_sq == to_sq:  # Return False if new_pos is same as curr_pos
+            debug("No new move made")
+            return False
+
+        piece = board[cp[0]][cp[1]]  # Get the piece that is selected
+        move_spot = board[np[0]][np[1]]  # The spot the player intends to move to
+
+        # Check if piece selected belongs to the current player
+        if piece.get_player() != self._current_player:
+            debug("Player can only move their own pieces.")
+            return False
+
+        if move_spot != "_______" and move_spot.get_player() == piece.get_player():
+            debug("Player cannot eat their own piece.")
+            return False
+
+        new_pos = [np[0], np[1]]  # The pieces take and keep positions as lists
+        if piece.legal_move_test(new_pos) is False:  # Check if new_pos is legal to the piece
+            debug("Illegal move")
+            return False
+
+        # Try the move to test the generals' sightlines and whether the current player's own General is exposed
+        old_pos = piece.get_position()
+        board[cp[0]][cp[1]] = "_______"
+        board[np[0]][np[1]] = piece
+        piece.set_position(new_pos)
+
+        sight = self.general_sight_test()
+        exposed = not sight and self.general_exposed_test(self._current_player, self._opp_player, move_spot)
+
+        board[cp[0]][cp[1]] = piece  # Reset original positions
+        piece.set_position(old_pos)
+        board[np[0]][np[1]] = move_spot
+        if sight:
+            return False
+        if exposed:
+            debug("Cannot move there. You're General would be in check.")
+            return False
+
+        if move_spot != "_______":
+            debug(move_spot.get_name() + " taken.")
+        self.push_move(encode_move(from_sq, to_sq))
+
+        # If the player who moved was in check, reset in check status to False after the move.
+        if self._opp_player.get_check_status() == True:
+            self._opp_player.set_check_status(False)
+            debug(self._opp_player.get_player_color(), "player no longer in check.")
+
+        debug(piece.get_name(), " moved to ", piece.get_position())
+
+        # Check if the player to move next is in check
+        if self.in_check_test(self._current_player, self._opp_player) == True:
+            self._current_player.set_check_status(True)
+            debug(self._current_player.get_player_color(), "player in check.")
+
+        # A player with no legal moves is checkmated or in stalemate, and the game is over. This also fills the legal
+        # move cache for the player to move.
+        if not self.legal_moves():
+            debug("Checkmate!", self._opp_player.get_player_color(), "wins.")
+            self.set_game_state(self._opp_player.get_player_color())
+        else:
+            # A position occurring for the third time ends the game by the repetition rules
+            state = self.repetition_state()
+            if state != "UNFINISHED":
+                self._game_state = state
+                debug("Repetition.", state)
+
+        return True
+
+    def get_position_key(self):
+        """Returns a key identifying the current position: the piece on every square and the side to move."""
+        if self._position_key is None:
+            key = bytearray(91)
+            for row in self._row_dimensions:
+                for col in self._col_dimensions:
+                    piece = self._board[row][col]
+                    if piece != "_______":
+                        key[row * 9 + col] = piece_code(piece)
+            key[90] = self._current_player == self._blk_player
+            self._position_key = bytes(key)
+        return self._position_key
+
+    def get_squares(self):
+        """Returns the board as a new list of piece codes (kind + 8 for black, 0 if empty) indexed by square."""
+        return list(self.get_position_key()[:90])
+
+    def get_hash(self):
+        """Returns the Zobrist hash of the current position, see zobrist.py."""
+        return self._hash
+
+    def get_repetition_count(self):
+        """Returns the number of times the current position has occurred, counting this time."""
+        return self._hash_counts.get(self._hash, 0)
+
+    def set_bounded_history(self, bounded):
+        """
+        Chooses how far back positions are remembered for the repetition rules. A position from before a capture
+        can never come back, so keeping only the hashes since the last capture finds the same repetitions with
+        memory that does not grow with the length of the game.
+        :param bounded: True to keep the hashes since the last capture, False to keep them since the start
+        """
+        self._bounded_history = bounded
+        self._rebuild_hashes()
+
+    def repetition_state(self):
+        """
+        Returns the game state the repetition rules give the current position: "UNFINISHED" unless the position has
+        occurred REPETITION_LIMIT times, else the result of the cycle of moves since it last occurred (see
+        rules.repetition_result). The game state itself is not changed, so this can be used after push_move().
+        """
+        if self._hash_counts.get(self._hash, 0) < REPETITION_LIMIT:
+            return "UNFINISHED"
+
+        # Find the cycle of moves since the position last occurred and the board at its start
+        hashes = self._hash_history
+        length = 1
+        while hashes[-1 - length] != self._hash:
+            length += 1
+        ply = self._history.get_ply()
+        moves = self._history.get_moves(ply - length, ply)
+        squares = bytearray(self.get_position_key()[:90])
+        for move in reversed(moves):  # A cycle has no captures, so no piece needs putting back
+            squares[move_from(move)] = squares[move_to(move)]
+            squares[move_to(move)] = NO_PIECE
+
+        side = 0 if self._current_player == self._red_player else 1
+        red, black = classify_cycle(squares, moves, side)
+        return repetition_result(red, black)
+
+    def _reset_hashes(self):
+        """Starts the hash history over from the current position."""
+        key = self.get_position_key()
+        self._hash = hash_squares(key[:90], key[90])
+        self._hash_history = array("Q", [self._hash])
+        self._hash_counts = {self._hash: 1}
+
+    def _record_hash(self, move):
+        """Updates the hash and the hash history after a move. The board must already show the move."""
+        to_sq = move_to(move)
+        piece = self._board[to_sq // 9][to_sq % 9]
+        code = piece_code(piece)
+        captured = move_captured(move)
+        if captured != NO_PIECE:
+            captured += 8 - (code & 8)  # The captured piece was the other color
+        self._hash = update_hash(self._hash, move, code, captured)
+
+        if captured != NO_PIECE and self._bounded_history:
+            self._hash_history = array("Q")
+            self._hash_counts = {}
+        self._hash_history.append(self._hash)
+        self._hash_counts[self._hash] = self._hash_counts.get(self._hash, 0) + 1
+
+    def _unrecord_hash(self, move):
+        """Updates the hash and the hash history after a move is undone. The board must already be restored."""
+        removed = self._hash_history.pop()
+        if self._hash_counts[removed] == 1:
+            del self._hash_counts[removed]
+        else:
+            self._hash_counts[removed] -= 1
+
+        if self._hash_history:
+            self._hash = self._hash_history[-1]
+        else:
+            # A bounded history starts after the capture that was undone, so the hashes before it are worked out again
+            self._rebuild_hashes()
+
+    def _rebuild_hashes(self):
+        """
+        Works out the hash history again from the current position by taking back the moves played, on a copy of
+        the board, to the start of the game or, for a bounded history, to the last capture.
+        """
+        key = self.get_position_key()
+        squares = bytearray(key[:90])
+        side = key[90]
+        current = hash_squares(squares, side)
+        hash_key = current
+        hashes = [current]
+        ply = self._history.get_ply()
+        for move in reversed(self._history.get_moves(0, ply)):
+            captured = move_captured(move)
+            if captured != NO_PIECE and self._bounded_history:
+                break
+            code = squares[move_to(move)]
+            if captured != NO_PIECE:
+                captured += 8 - (code & 8)
+            hash_key = update_hash(hash_key, move, code, captured)
+            squares[move_from(move)] = code
+            squares[move_to(move)] = captured
+            hashes.append(hash_key)
+
+        hashes.reverse()
+        self._hash = current
+        self._hash_history = array("Q", hashes)
+        self._hash_counts = {}
+        for hash_key in hashes:
+            self._hash_counts[hash_key] = self._hash_counts.get(hash_key, 0) + 1
+
+    def general_exposed_test(self, testing_player, enemy, ignore=None):
+        """
+        Tests if a player's General is attacked by an enemy piece or faces the enemy General, without printing.
+        :param testing_player: Player whose general is being tested.
+        :param enemy: The opponent of the tested player
+        :param ignore: an enemy piece to leave out, e.g. one that is being captured in a test move
+        :return: True if the general is attacked or sees the enemy general. Else False.
+        """
+        if testing_player == self._red_player:
+            gp = self._red_general.get_position()
+            egp = self._blk_general.get_position()
+        else:
+            gp = self._blk_general.get_position()
+            egp = self._red_general.get_position()
+
+        for piece in enemy.get_active_pieces():
+            if piece is not ignore and piece.legal_move_test(gp) == True:
+                return True
+
+        # Generals cannot face each other on an open column
+        if gp[1] == egp[1]:
+            for row in range(min(gp[0], egp[0]) + 1, max(gp[0], egp[0])):
+                if self._board[row][gp[1]] != "_______":
+                    return False
+            return True
+
+        return False
+
+    def safe_move_test(self, piece, new_pos):
+        """
+        Tests if a move of one of the current player's pieces is legal, including that it does not leave their own
+        General in check or facing the other General. The board is left unchanged.
+        :param piece: the piece to move
+        :param new_pos: the position it would move to
+        :return: True if the move is legal. Else False
+        """
+        board = self._board
+        move_spot = board[new_pos[0]][new_pos[1]]
+        if move_spot != "_______" and move_spot.get_player() == piece.get_player():
+            return False
+        if piece.legal_move_test(new_pos) is False:
+            return False
+
+        # Temporarily make the move to test the current player's general
+        cp = piece.get_position()
+        board[cp[0]][cp[1]] = "_______"
+        board[new_pos[0]][new_pos[1]] = piece
+        piece.set_position(new_pos)
+
+        exposed = self.general_exposed_test(self._current_player, self._opp_player, move_spot)
+
+        board[cp[0]][cp[1]] = piece  # Return the board to original state
+        board[new_pos[0]][new_pos[1]] = move_spot
+        piece.set_position(cp)
+
+        return not exposed
+
+    def legal_moves(self):
+        """
+        Returns the legal moves of the current player as a dictionary of from-square to a list of to-squares, or an
+        empty dictionary once the game is over. Results are cached by position, so asking again before the board
+        changes (or after returning to the position with undo and redo) costs a dictionary lookup.
+        """
+        # A game can end by the repetition rules, which depend on the moves that led to the position, so the game
+        # state is checked here and the cache holds only what the position alone decides
+        if self._game_state != "UNFINISHED":
+            return {}
+
+        key = self.get_position_key()
+        moves = self._legal_cache.get(key)
+        if moves is not None:
+            return moves
+
+        moves = {}
+        for piece in list(self._current_player.get_active_pieces()):
+            cp = piece.get_position()
+            destinations = [square(pos[0], pos[1]) for pos in piece.candidate_positions()
+                            if self.safe_move_test(piece, pos)]
+            if destinations:
+                moves[square(cp[0], cp[1])] = destinations
+
+        if len(self._legal_cache) >= LEGAL_CACHE_SIZE:
+            self._legal_cache.clear()
+        self._legal_cache[key] = moves
+        return moves
+
+    def legal_move_list(self):
+        """Returns the legal moves of the current player as a list of packed moves (see move.py)."""
+        return [encode_move(from_sq, to_sq) for from_sq, destinations in self.legal_moves().items()
+                for to_sq in destinations]
+
+    def legal_destinations(self, sq):
+        """Returns the list of squares the current player's piece on a square can legally move to."""
+        return self.legal_moves().get(sq, [])
+
+    def play_move(self, move):
+        """
+        Makes a packed move (see move.py) for the current player.
+        :param move: the packed move to be made
+        :return: True if move is legal. Else return False
+        """
+        return self._make_move(move_from(move), move_to(move))
+
+    def push_move(self, move):
+        """
+        Makes a packed move that is already known to be legal, e.g. one from legal_moves(), without testing for
+        check or checkmate. Used by search, which finds mates itself and undoes every move with undo_move().
+        Check statuses and the game state are not updated.
+        :param move: the packed move to be made
+        """
+        board = self._board
+        from_sq = move_from(move)
+        to_sq = move_to(move)
+        cp = SQUARE_POSITIONS[from_sq]
+        np = SQUARE_POSITIONS[to_sq]
+        piece = board[cp[0]][cp[1]]
+        move_spot = board[np[0]][np[1]]
+
+        captured = NO_PIECE
+        if move_spot != "_______":
+            self._opp_player.piece_removed(move_spot)
+            captured = PIECE_KINDS[move_spot.get_name()]
+
+        board[cp[0]][cp[1]] = "_______"
+        board[np[0]][np[1]] = piece
+        piece.set_position([np[0], np[1]])
+
+        move = encode_move(from_sq, to_sq, captured)
+        self._history.record(move)
+        self._position_key = None
+        self._record_hash(move)
+        self.change_turn()
+        for listener in self._listeners:
+            listener.move_made(move)
+
+    def undo_move(self):
+        """
+        Takes back the last move played, restoring any piece it captured.
+        :return: True if a move was undone. False if there are no moves to undo.
+        """
+        move = self._history.step_back()
+        if move is None:
+            return False
+
+        board = self._board
+        op = SQUARE_POSITIONS[move_from(move)]  # Original position of the moved piece
+        np = SQUARE_POSITIONS[move_to(move)]
+
+        piece = board[np[0]][np[1]]
+        board[op[0]][op[1]] = piece
+        piece.set_position([op[0], op[1]])
+
+        # The player whose piece was captured is the current player, since the turn changed after the move
+        if move_captured(move) != NO_PIECE:
+            board[np[0]][np[1]] = self._current_player.piece_restored()
+        else:
+            board[np[0]][np[1]] = "_______"
+
+        self.change_turn()
+        self._position_key = None
+        self._unrecord_hash(move)
+        self._game_state = "UNFINISHED"
+        for listener in self._listeners:
+            listener.move_undone(move)
+        self._current_player.set_check_status(self.general_exposed_test(self._current_player, self._opp_player))
+        self._opp_player.set_check_status(False)
+        return True
+
+    def redo_move(self):
+        """
+        Replays the last undone move.
+        :return: True if a move was redone. False if there are no moves to redo.
+        """
+        move = self._history.next_move()
+        if move is None:
+            return False
+        return self.play_move(move)
+
+    def goto_ply(self, ply):
+        """
+        Undoes or redoes moves until the given number of moves has been played.
+        :param ply: number of moves from the start of the game, between 0 and the length of the history
+        :return: True if the board is at the requested ply. Else False
+        """
+        while self._history.get_ply() > ply:
+            self.undo_move()
+        while self._history.get_ply() < ply:
+            if self.redo_move() is False:
+                return False
+        return self._history.get_ply() == ply
+
+    def show_turns(self):
+        debug("Current", self._current_player.get_player_color())
+        debug("Opponent", self._opp_player.get_player_color())
+
+
+def debug(msg1, msg2="", msg3="", msg4=""):
+    DEBUG = True
+    if DEBUG == True:
+        print(msg1, msg2, msg3, msg4)
@@ -0,0 +1,47 @@
+# Description: Zobrist hashing of XiangQi positions. Every piece code on every square has a fixed random 64-bit
+#  key, and a position's hash is the exclusive or of the keys of its pieces, plus one more key when black is to move.
+#  A move changes the hash by a few exclusive ors, so the hash can be kept up to date move by move. The keys come
+#  from a fixed seed, so hashes are the same in every run and can be stored on disk.
+
+import random
+from move import NO_PIECE, move_from, move_to
+
+ZOBRIST_SEED = 20200607
+
+
+def build_keys():
+    """Returns the random key of each piece code on each square, as a list indexed by code of lists indexed by square."""
+    rng = random.Random(ZOBRIST_SEED)
+    return [[rng.getrandbits(64) if code & 7 != NO_PIECE else 0 for sq in range(90)] for code in range(16)]
+
+
+PIECE_KEYS = build_keys()
+SIDE_KEY = random.Random(ZOBRIST_SEED + 1).getrandbits(64)  # Included when black is to move
+
+
+def hash_squares(squares, side):
+    """
+    Returns the hash of a position.
+    :param squares: the board as piece codes (kind + 8 for black) indexed by square
+    :param side: the color to move, 0 red and 1 black
+    """
+    key = SIDE_KEY if side == 1 else 0
+    for sq, code in enumerate(squares):
+        if code != NO_PIECE:
+            key ^= PIECE_KEYS[code][sq]
+    return key
+
+
+def update_hash(key, move, code, captured=NO_PIECE):
+    """
+    Returns the hash after a move, or before it when given the hash after it.
+    :param key: hash of the position
+    :param move: the packed move
+    :param code: piece code of the piece moved
+    :param captured: piece code of the piece captured, NO_PIECE if none
+    """
+    keys = PIECE_KEYS[code]
+    key ^= keys[move_from(move)] ^ keys[move_to(move)] ^ SIDE_KEY
+    if captured != NO_PIECE:
+        key ^= PIECE_KEYS[captured][move_to(move)]
+    return key